@@ -0,0 +1,403 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+from sqlalchemy import text
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.scoring import latest_scoring_run_id
+from app.database import engine
+from peer_moments import MIN_PEER_GROUP, Z_CAP
+
+# In-process snapshot of what a claim is scored against: peer baselines,
+# CPT / RBCS complexity, provider specialties and running provider x CPT
+# usage. Text codes (specialty, cpt_code, rbcs_id, risk_level) are interned
+# once into integer indexes, and everything else is NumPy arrays indexed by
+# them, so lookups are vectorized array reads instead of SQL joins on text
+# columns.
+#
+# With SNAPSHOT_DIR set, each scoring run's snapshot is written there once
+# as plain .npy files plus a JSON file of the code lists, and every uvicorn
+# worker memory-maps the same files: one copy in the page cache per host.
+# Any process can read them with numpy.load(..., mmap_mode="r").
+#
+# The watcher reloads the snapshot in the background when a new scoring run
+# completes; requests keep using the old one until the swap.
+
+log = logging.getLogger("app.baselines")
+
+# Code lists: a code's position is its integer index
+CODE_FIELDS = ("cpts", "specialties", "rbcs_ids", "risk_levels")
+ARRAY_FIELDS = (
+    "complexity",
+    "risk_level",
+    "rbcs",
+    "baseline_n",
+    "baseline_mean",
+    "baseline_std",
+    "provider_ids",
+    "provider_specialty",
+    "usage_keys",
+    "usage_counts",
+)
+META_FILE = "snapshot.json"
+# Run directories kept in SNAPSHOT_DIR; older ones are removed
+KEEP_RUNS = 2
+
+
+@dataclass(frozen=True)
+class BaselineSnapshot:
+    run_id: int | None
+    cpts: list
+    specialties: list
+    rbcs_ids: list
+    risk_levels: list
+    # Per CPT [cpt_idx]; -1 = none
+    complexity: np.ndarray          # int16 complexity_score
+    risk_level: np.ndarray          # int8 index into risk_levels
+    rbcs: np.ndarray                # int32 index into rbcs_ids
+    # Peer baselines [specialty_idx, cpt_idx]; n = 0 where there is none
+    baseline_n: np.ndarray          # int32
+    baseline_mean: np.ndarray       # float64
+    baseline_std: np.ndarray        # float64, NaN for one-provider groups
+    # Providers, sorted by provider_id
+    provider_ids: np.ndarray
+    provider_specialty: np.ndarray  # int32 specialty_idx
+    # Running usage, sorted by key = provider_id * len(cpts) + cpt_idx
+    usage_keys: np.ndarray
+    usage_counts: np.ndarray
+    cpt_index: dict = field(init=False, repr=False, compare=False)
+    specialty_index: dict = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "cpt_index", {c: i for i, c in enumerate(self.cpts)})
+        object.__setattr__(self, "specialty_index", {s: i for i, s in enumerate(self.specialties)})
+
+    @property
+    def n_cpts(self):
+        return len(self.cpts)
+
+    def cpt_codes(self, codes):
+        return encode(self.cpt_index, codes)
+
+    def specialty_codes(self, names):
+        return encode(self.specialty_index, names)
+
+    def baseline(self, specialty_idx, cpt_idx):
+        """
+        Vectorized peer baseline lookup: (n, mean, std) arrays for pairs of
+        indexes; -1 indexes give n = 0 and NaN.
+        """
+        specialty_idx = np.asarray(specialty_idx)
+        cpt_idx = np.asarray(cpt_idx)
+        found = (specialty_idx >= 0) & (cpt_idx >= 0)
+        cell = (np.maximum(specialty_idx, 0), np.maximum(cpt_idx, 0))
+        return (
+            _take(self.baseline_n, cell, found, 0),
+            _take(self.baseline_mean, cell, found, np.nan),
+            _take(self.baseline_std, cell, found, np.nan),
+        )
+
+
+def encode(index, codes):
+    # Codes to integer indexes, -1 for codes the snapshot does not know
+    return np.fromiter((index.get(c, -1) for c in codes), dtype=np.int64, count=len(codes))
+
+
+def _lookup(keys, sorted_keys):
+    # Positions of keys in sorted_keys, and which of them were found
+    if not len(sorted_keys):
+        return np.zeros(len(keys), dtype=np.int64), np.zeros(len(keys), dtype=bool)
+    pos = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    return pos, sorted_keys[pos] == keys
+
+
+def _take(values, pos, found, missing):
+    if not values.size:
+        return np.full(len(found), missing)
+    return np.where(found, values[pos], missing)
+
+
+def _interned(values):
+    index = {}
+    for value in values:
+        if value is not None:
+            index.setdefault(value, len(index))
+    return index
+
+
+def build_snapshot(run_id, baselines, complexity, providers, usage):
+    """
+    Build a snapshot from the fetched rows:
+      baselines  (specialty, cpt_code, n_providers, avg_usage, std_usage)
+      complexity (cpt_code, rbcs_id, complexity_score, risk_level)
+      providers  (provider_id, specialty)
+      usage      (provider_id, cpt_code, usage_count)
+    """
+    cpt_index = _interned([r[1] for r in baselines] + [r[0] for r in complexity])
+    specialty_index = _interned([r[0] for r in baselines] + [r[1] for r in providers])
+    rbcs_index = _interned(r[1] for r in complexity)
+    level_index = {level: i for i, level in enumerate(sorted(_interned(r[3] for r in complexity)))}
+    n_cpts = len(cpt_index)
+
+    cpt_complexity = np.full(n_cpts, -1, dtype=np.int16)
+    cpt_risk_level = np.full(n_cpts, -1, dtype=np.int8)
+    cpt_rbcs = np.full(n_cpts, -1, dtype=np.int32)
+    for cpt_code, rbcs_id, score, level in complexity:
+        i = cpt_index[cpt_code]
+        if rbcs_id is not None:
+            cpt_rbcs[i] = rbcs_index[rbcs_id]
+        if score is not None:
+            cpt_complexity[i] = score
+        if level is not None:
+            cpt_risk_level[i] = level_index[level]
+
+    shape = (len(specialty_index), n_cpts)
+    baseline_n = np.zeros(shape, dtype=np.int32)
+    baseline_mean = np.full(shape, np.nan)
+    baseline_std = np.full(shape, np.nan)
+    if baselines:
+        rows = np.array([specialty_index[r[0]] for r in baselines])
+        cols = np.array([cpt_index[r[1]] for r in baselines])
+        baseline_n[rows, cols] = [r[2] for r in baselines]
+        baseline_mean[rows, cols] = [r[3] for r in baselines]
+        baseline_std[rows, cols] = [np.nan if r[4] is None else r[4] for r in baselines]
+
+    provider_ids = np.array([r[0] for r in providers], dtype=np.int64)
+    provider_specialty = np.array([specialty_index[r[1]] for r in providers], dtype=np.int32)
+    provider_order = np.argsort(provider_ids, kind="stable")
+
+    usage = [r for r in usage if r[1] in cpt_index]
+    usage_keys = np.array([r[0] * n_cpts + cpt_index[r[1]] for r in usage], dtype=np.int64)
+    usage_counts = np.array([r[2] for r in usage], dtype=np.int64)
+    usage_order = np.argsort(usage_keys)
+
+    return BaselineSnapshot(
+        run_id=run_id,
+        cpts=list(cpt_index),
+        specialties=list(specialty_index),
+        rbcs_ids=list(rbcs_index),
+        risk_levels=list(level_index),
+        complexity=cpt_complexity,
+        risk_level=cpt_risk_level,
+        rbcs=cpt_rbcs,
+        baseline_n=baseline_n,
+        baseline_mean=baseline_mean,
+        baseline_std=baseline_std,
+        provider_ids=provider_ids[provider_order],
+        provider_specialty=provider_specialty[provider_order],
+        usage_keys=usage_keys[usage_order],
+        usage_counts=usage_counts[usage_order],
+    )
+
+
+async def load_snapshot(conn):
+    """
+    Read the scoring-run tables into a new snapshot. conn is an
+    AsyncConnection; all reads share one REPEATABLE READ snapshot, so the
+    arrays and run_id always describe the same scoring run.
+    """
+    await conn.execution_options(isolation_level="REPEATABLE READ")
+    async with conn.begin():
+        run_id = await latest_scoring_run_id(conn)
+        baselines = (await conn.execute(text("""
+            SELECT specialty, cpt_code, n_providers, avg_usage::float8, std_usage::float8
+            FROM specialty_cpt_baseline_mat
+        """))).all()
+        # CPT -> RBCS complexity, as in cpt_complexity_view, but for every
+        # CPT in the taxonomy rather than only those already billed
+        complexity = (await conn.execute(text("""
+            SELECT r.hcpcs_cd, r.rbcs_id, rc.complexity_score, rc.risk_level
+            FROM rbcs_taxonomy r
+            LEFT JOIN rbcs_complexity rc ON r.rbcs_id = rc.rbcs_id
+            WHERE r.hcpcs_cd IS NOT NULL
+        """))).all()
+        providers = (await conn.execute(text("""
+            SELECT provider_id, specialty
+            FROM providers
+            WHERE provider_id IS NOT NULL AND specialty IS NOT NULL
+        """))).all()
+        usage = (await conn.execute(text("""
+            SELECT provider_id, cpt_code, usage_count
+            FROM provider_cpt_usage_mat
+        """))).all()
+    # Array building is CPU-bound; keep it off the event loop
+    return await asyncio.to_thread(build_snapshot, run_id, baselines, complexity, providers, usage)
+
+
+# ---- SHARED FILES (SNAPSHOT_DIR) ----
+def snapshot_path(directory, run_id):
+    return os.path.join(directory, f"run_{run_id}")
+
+
+def save_snapshot(snapshot, directory):
+    """
+    Write the snapshot to SNAPSHOT_DIR/run_<id>/ unless it is already
+    there. Files are written to a temporary directory and renamed into
+    place, so readers never see a partial snapshot and concurrent writers
+    (several workers noticing the same run) do not clash.
+    """
+    target = snapshot_path(directory, snapshot.run_id)
+    if os.path.isdir(target):
+        return target
+    os.makedirs(directory, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=".tmp-", dir=directory)
+    os.chmod(tmp, 0o755)
+    for name in ARRAY_FIELDS:
+        np.save(os.path.join(tmp, f"{name}.npy"), getattr(snapshot, name))
+    with open(os.path.join(tmp, META_FILE), "w") as f:
+        json.dump({"run_id": snapshot.run_id, **{c: getattr(snapshot, c) for c in CODE_FIELDS}}, f)
+    try:
+        os.rename(tmp, target)
+    except OSError:
+        # Another worker got there first
+        shutil.rmtree(tmp, ignore_errors=True)
+    return target
+
+
+def open_snapshot(path):
+    # Arrays are memory-mapped read-only; only the code lists are copied
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    return BaselineSnapshot(
+        run_id=meta["run_id"],
+        **{c: meta[c] for c in CODE_FIELDS},
+        **{name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ARRAY_FIELDS},
+    )
+
+
+def prune_snapshots(directory, keep=KEEP_RUNS):
+    # Unlinking files another worker still has mapped is safe on POSIX
+    runs = sorted(
+        (int(name[4:]) for name in os.listdir(directory)
+         if name.startswith("run_") and name[4:].isdigit()),
+        reverse=True,
+    )
+    for run_id in runs[keep:]:
+        shutil.rmtree(snapshot_path(directory, run_id), ignore_errors=True)
+
+
+# ---- SCORING ----
+def score_claims(snapshot, provider_ids, cpt_codes):
+    """
+    Vectorized deviation / complexity signal for a batch of claims.
+
+    Each claim is scored as one more claim on top of the provider's running
+    usage for that CPT, against the specialty x CPT peer baseline, the same
+    way provider_deviation_mat and provider_fraud_explanation_mat are built.
+    Returns a dict of arrays, one entry per claim; NaN / -1 mark values the
+    snapshot has no data for.
+    """
+    provider_ids = np.asarray(provider_ids, dtype=np.int64)
+    cpt_idx = snapshot.cpt_codes(cpt_codes)
+    known_cpt = cpt_idx >= 0
+
+    pos, known_provider = _lookup(provider_ids, snapshot.provider_ids)
+    specialty_idx = _take(snapshot.provider_specialty, pos, known_provider, -1)
+
+    pos, found = _lookup(provider_ids * snapshot.n_cpts + cpt_idx, snapshot.usage_keys)
+    usage = _take(snapshot.usage_counts, pos, found & known_cpt, 0) + 1
+
+    n, mean, std = snapshot.baseline(specialty_idx, cpt_idx)
+    deviation = usage - mean
+    # peer_moments.capped_z_sql, vectorized
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.clip(deviation / std, -Z_CAP, Z_CAP)
+    z = np.where((std == 0) | np.isnan(std), 0.0, z)
+    z = np.where(n < MIN_PEER_GROUP, np.nan, z)
+
+    pos = np.maximum(cpt_idx, 0)
+    complexity = _take(snapshot.complexity, pos, known_cpt, -1)
+    risk_level = _take(snapshot.risk_level, pos, known_cpt, -1)
+    contribution = np.where(
+        complexity >= 0, np.maximum(deviation, 0) * complexity, np.nan
+    )
+
+    return {
+        "known_provider": known_provider,
+        "specialty_idx": specialty_idx,
+        "usage_count": usage,
+        "peer_group_size": n,
+        "peer_avg_usage": mean,
+        "peer_std_usage": std,
+        "deviation": deviation,
+        "usage_z": z,
+        "complexity_score": complexity,
+        "risk_level_idx": risk_level,
+        "risk_contribution": contribution,
+    }
+
+
+class SnapshotStore:
+    """
+    Holds the current snapshot. Readers take `store.snapshot` (a plain
+    attribute read, swapped atomically on reload); `watch` polls for new
+    scoring runs.
+    """
+
+    def __init__(self, engine, directory=None):
+        self.engine = engine
+        self.directory = directory
+        self.snapshot = None
+        self.last_load_seconds = None
+
+    async def refresh(self):
+        async with self.engine.connect() as conn:
+            run_id = await latest_scoring_run_id(conn)
+        if self.snapshot is not None and run_id == self.snapshot.run_id:
+            return False
+
+        start = time.perf_counter()
+        snapshot = None
+        shared = self.directory and run_id is not None
+        if shared and os.path.isdir(snapshot_path(self.directory, run_id)):
+            # Already written by another worker
+            snapshot = await asyncio.to_thread(open_snapshot, snapshot_path(self.directory, run_id))
+        if snapshot is None:
+            async with self.engine.connect() as conn:
+                snapshot = await load_snapshot(conn)
+            if shared and snapshot.run_id is not None:
+                path = await asyncio.to_thread(save_snapshot, snapshot, self.directory)
+                snapshot = await asyncio.to_thread(open_snapshot, path)
+                await asyncio.to_thread(prune_snapshots, self.directory)
+        self.last_load_seconds = time.perf_counter() - start
+        self.snapshot = snapshot
+        log.info(
+            "Loaded scoring snapshot for run %s in %.2fs (%d specialties x %d CPTs, %d usage rows)",
+            snapshot.run_id, self.last_load_seconds,
+            len(snapshot.specialties), snapshot.n_cpts, len(snapshot.usage_keys),
+        )
+        return True
+
+    async def watch(self, interval):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("Scoring snapshot reload failed; keeping the previous one")
+            # psycopg's AsyncConnection.connect() swallows a cancel that lands
+            # mid-connect; honour it here so shutdown doesn't wait on the loop
+            if asyncio.current_task().cancelling():
+                raise asyncio.CancelledError
+            await asyncio.sleep(interval)
+
+
+snapshot_store = SnapshotStore(engine, settings.snapshot_dir)
+
+metrics.registry.register(metrics.Gauge(
+    "scoring_snapshot_run_id", "Scoring run loaded into the claim-scoring snapshot",
+    lambda: snapshot_store.snapshot.run_id if snapshot_store.snapshot else None,
+))
+metrics.registry.register(metrics.Gauge(
+    "scoring_snapshot_load_seconds", "Time taken by the last snapshot reload",
+    lambda: snapshot_store.last_load_seconds,
+))
@@ -0,0 +1,241 @@
+import functools
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from cachetools import TTLCache
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.scoring import SCORING_RUN_HEADER, latest_scoring_run_id
+
+# Response cache for the read-only analytics routes. Their data only changes
+# when a scoring run completes, so the latest scoring run id is part of
+# every key: a new run makes all older entries unreachable (and they are
+# purged as soon as the new version is seen). TTL and size limits bound
+# memory in between.
+#
+# Lookups go to the in-process LRU first, then to the optional sqlite file
+# (CACHE_SQLITE_PATH), which is shared by all uvicorn workers on a host.
+# sqlite lookups are local sub-millisecond reads and run inline.
+
+CACHE_HEADER = "X-Cache"
+
+# Response headers replayed on a cache hit
+CACHED_HEADERS = (SCORING_RUN_HEADER, NEXT_CURSOR_HEADER)
+
+
+class SqliteCacheBackend:
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    version INTEGER,
+                    expires_at REAL NOT NULL,
+                    value TEXT NOT NULL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS response_cache_expires_idx "
+                "ON response_cache (expires_at)"
+            )
+
+    def _conn(self):
+        # sqlite connections are per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM response_cache WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, version, value, ttl):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO response_cache (key, version, expires_at, value) "
+            "VALUES (?, ?, ?, ?)",
+            (key, version, time.time() + ttl, json.dumps(value)),
+        )
+        # Size bound: expired entries first, then the soonest to expire
+        conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),))
+        conn.execute(
+            """
+            DELETE FROM response_cache WHERE key IN (
+                SELECT key FROM response_cache
+                ORDER BY expires_at DESC
+                LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+
+    def purge_before(self, version):
+        self._conn().execute(
+            "DELETE FROM response_cache WHERE version IS NOT ? AND version < ?",
+            (version, version),
+        )
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        ttl=settings.cache_ttl_seconds,
+        max_entries=settings.cache_max_entries,
+        version_ttl=settings.cache_version_ttl_seconds,
+        sqlite_path=settings.cache_sqlite_path,
+    ):
+        self.ttl = ttl
+        self.version_ttl = version_ttl
+        self._lru = TTLCache(maxsize=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+        self._shared = SqliteCacheBackend(sqlite_path, max_entries) if sqlite_path else None
+        self._version = None
+        self._version_checked = 0.0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    # ---- scoring-data version ----
+    async def version(self, db):
+        # The latest run id is re-read at most every version_ttl seconds, so
+        # a hit costs no database round trip at all
+        now = time.monotonic()
+        if now - self._version_checked < self.version_ttl:
+            return self._version
+        version = await latest_scoring_run_id(db)
+        with self._lock:
+            if version != self._version:
+                self._lru.clear()
+                if self._shared and version is not None:
+                    self._shared.purge_before(version)
+            self._version = version
+            self._version_checked = now
+        return version
+
+    # ---- entries ----
+    @staticmethod
+    def make_key(name, version, params):
+        # None-valued params are dropped, so ?specialty= and no specialty match
+        normalized = sorted((k, v) for k, v in params.items() if v is not None)
+        raw = json.dumps([name, version, normalized], default=str, separators=(",", ":"))
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry
+        if self._shared:
+            entry = self._shared.get(key)
+            if entry is not None:
+                with self._lock:
+                    self._lru[key] = entry
+                    self.shared_hits += 1
+                return entry
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, version, entry):
+        with self._lock:
+            self._lru[key] = entry
+        if self._shared:
+            self._shared.set(key, version, entry, self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            self._version_checked = 0.0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "version": self._version,
+                "entries": len(self._lru),
+                "max_entries": self._lru.maxsize,
+                "ttl_seconds": self.ttl,
+                "shared_backend": "sqlite" if self._shared else None,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits + self.shared_hits) / lookups if lookups else None,
+            }
+
+
+response_cache = ResponseCache()
+
+metrics.registry.register(metrics.Gauge(
+    "response_cache_hits_total", "Response cache hits (in-process LRU)",
+    lambda: response_cache.hits, kind="counter",
+))
+metrics.registry.register(metrics.Gauge(
+    "response_cache_shared_hits_total", "Response cache hits (shared sqlite backend)",
+    lambda: response_cache.shared_hits, kind="counter",
+))
+metrics.registry.register(metrics.Gauge(
+    "response_cache_misses_total", "Response cache misses",
+    lambda: response_cache.misses, kind="counter",
+))
+metrics.registry.register(metrics.Gauge(
+    "response_cache_entries", "Entries in the in-process LRU",
+    lambda: len(response_cache._lru),
+))
+
+
+def cached_response(name):
+    """
+    Cache an async route's JSON body (and its X-Scoring-Run / X-Next-Cursor
+    headers) per scoring run.
+
+    The route must take `response: Response` and `db: AsyncSession`; every
+    other argument is a request parameter and goes into the key. A route
+    that returns a Response itself (e.g. a columnar body) is not cached.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            response = kwargs["response"]
+            if not settings.cache_enabled:
+                return await func(*args, **kwargs)
+
+            version = await response_cache.version(kwargs["db"])
+            params = {k: v for k, v in kwargs.items() if k not in ("response", "db")}
+            key = response_cache.make_key(name, version, params)
+
+            entry = response_cache.get(key)
+            if entry is None:
+                result = await func(*args, **kwargs)
+                if isinstance(result, Response):
+                    return result
+                body = jsonable_encoder(result)
+                headers = {h: response.headers[h] for h in CACHED_HEADERS if h in response.headers}
+                entry = {"body": body, "headers": headers}
+                response_cache.set(key, version, entry)
+                response.headers[CACHE_HEADER] = "miss"
+            else:
+                response.headers.update(entry["headers"])
+                response.headers[CACHE_HEADER] = "hit"
+            return entry["body"]
+
+        return wrapper
+
+    return decorator
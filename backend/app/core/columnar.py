@@ -0,0 +1,55 @@
+from typing import Literal
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi import Request, Response
+
+from app.core.export_formats import arrow_array
+
+# Columnar responses for pandas / pyarrow clients. Rows go from the cursor
+# straight into one Arrow record batch (no per-row Pydantic models or JSON)
+# and are sent as an Arrow IPC stream or a Parquet file:
+#   pyarrow.ipc.open_stream(resp.content).read_pandas()
+#   pandas.read_parquet(io.BytesIO(resp.content))
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+PARQUET = "application/vnd.apache.parquet"
+
+ResponseFormat = Literal["json", "arrow", "parquet"]
+
+
+def response_format(request: Request, format: ResponseFormat | None = None) -> str:
+    """
+    Dependency picking the response format: an explicit ?format= wins,
+    then the Accept header, then JSON.
+    """
+    if format:
+        return format
+    accept = request.headers.get("accept", "")
+    if ARROW_STREAM in accept:
+        return "arrow"
+    if PARQUET in accept:
+        return "parquet"
+    return "json"
+
+
+def columnar_response(rows, schema, fmt, headers=None):
+    # rows are result mappings; each schema field is read out by name
+    batch = pa.RecordBatch.from_arrays(
+        [arrow_array([row[field.name] for row in rows], field) for field in schema],
+        schema=schema,
+    )
+    sink = pa.BufferOutputStream()
+    if fmt == "parquet":
+        pq.write_table(pa.Table.from_batches([batch], schema=schema), sink)
+        media_type = PARQUET
+    else:
+        with pa.ipc.new_stream(sink, schema) as writer:
+            writer.write_batch(batch)
+        media_type = ARROW_STREAM
+    return Response(sink.getvalue().to_pybytes(), media_type=media_type, headers=headers)
+
+
+def column_dict(rows, schema):
+    # Compact JSON counterpart: one list per column instead of one object per row
+    return {name: [row[name] for row in rows] for name in schema.names}
@@ -8,6 +8,34 @@ class Settings(BaseSettings):
     db_host: str = Field("localhost", env="DB_HOST")
     db_port: int = Field(5432, env="DB_PORT")
 
+    # Connection pool (app/database.py), per uvicorn worker
+    db_pool_size: int = Field(20, env="DB_POOL_SIZE")
+    db_max_overflow: int = Field(20, env="DB_MAX_OVERFLOW")
+    db_pool_timeout: float = Field(10.0, env="DB_POOL_TIMEOUT")
+    db_pool_recycle: int = Field(1800, env="DB_POOL_RECYCLE")
+    db_pool_pre_ping: bool = Field(True, env="DB_POOL_PRE_PING")
+    # Server-side statement timeout for API queries, 0 = none
+    db_statement_timeout_ms: int = Field(30000, env="DB_STATEMENT_TIMEOUT_MS")
+    # Statements slower than this are logged (app.sql logger) and counted
+    slow_query_ms: int = Field(500, env="SLOW_QUERY_MS")
+
+    # Rows fetched per server-side cursor batch by the /export routes
+    export_batch_rows: int = Field(10000, env="EXPORT_BATCH_ROWS")
+
+    # Response cache (app/core/cache.py)
+    cache_enabled: bool = Field(True, env="CACHE_ENABLED")
+    cache_ttl_seconds: int = Field(300, env="CACHE_TTL_SECONDS")
+    cache_max_entries: int = Field(2048, env="CACHE_MAX_ENTRIES")
+    # How long the latest scoring run id is trusted before re-checking
+    cache_version_ttl_seconds: float = Field(2.0, env="CACHE_VERSION_TTL_SECONDS")
+    # Optional sqlite file shared by all workers on the host
+    cache_sqlite_path: str | None = Field(None, env="CACHE_SQLITE_PATH")
+
+    # How often /claims/score checks for a new scoring run to load
+    snapshot_poll_seconds: float = Field(5.0, env="SNAPSHOT_POLL_SECONDS")
+    # Directory for the memory-mapped snapshot files shared by all workers
+    snapshot_dir: str | None = Field(None, env="SNAPSHOT_DIR")
+
     @property
     def database_url(self) -> str:
         return (
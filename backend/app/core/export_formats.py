@@ -0,0 +1,82 @@
+import csv
+import io
+import json
+
+import pyarrow as pa
+
+# Encoders for streamed exports. Each takes an async iterator of row batches
+# (lists of tuples, all with the same columns) and yields bytes, one chunk per
+# batch, so memory stays at one batch regardless of the result size.
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+FILE_EXTENSIONS = {"ndjson": "ndjson", "csv": "csv", "arrow": "arrows"}
+
+
+async def ndjson_chunks(batches, columns):
+    async for rows in batches:
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in rows
+        ).encode()
+
+
+async def csv_chunks(batches, columns):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    async for rows in batches:
+        writer.writerows(rows)
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+
+def arrow_array(values, field):
+    try:
+        return pa.array(values, type=field.type)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        # NUMERIC columns arrive as Decimal; let Arrow infer a decimal type
+        # and cast it to the schema's type (usually float64)
+        return pa.array(values).cast(field.type)
+
+
+def record_batch(rows, schema):
+    # Column-wise build straight from the fetched tuples
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    return pa.RecordBatch.from_arrays(
+        [arrow_array(values, field) for values, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+async def arrow_chunks(batches, schema):
+    # Arrow IPC stream: schema message first, then one record batch message
+    # per fetched batch
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        yield _drain(sink)
+        async for rows in batches:
+            writer.write_batch(record_batch(rows, schema))
+            yield _drain(sink)
+    yield _drain(sink)
+
+
+def _drain(sink):
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+
+def encode(fmt, batches, schema):
+    if fmt == "arrow":
+        return arrow_chunks(batches, schema)
+    if fmt == "csv":
+        return csv_chunks(batches, schema.names)
+    return ndjson_chunks(batches, schema.names)
@@ -0,0 +1,200 @@
+import bisect
+import functools
+import threading
+import time
+from contextvars import ContextVar
+
+from fastapi.routing import APIRoute
+
+# Minimal Prometheus text-format metrics (no client library dependency).
+# Metrics are per process; with several uvicorn workers, scrape each one or
+# aggregate in Prometheus by instance.
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield self.name, _labels(self.label_names, labels), value
+
+
+class Gauge:
+    # Value read from a callback at scrape time; kind="counter" exposes a
+    # monotonic count kept elsewhere (e.g. the response cache counters)
+    def __init__(self, name, help, fn, kind="gauge"):
+        self.name, self.help, self.fn, self.kind = name, help, fn, kind
+
+    def samples(self):
+        value = self.fn()
+        if value is not None:
+            yield self.name, "", value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            if i < len(self.buckets):
+                series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, (list(b), s, n)) for labels, (b, s, n) in self._series.items()]
+        names = self.label_names + ("le",)
+        for labels, (counts, total, n) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket", _labels(names, labels + (bound,)), cumulative
+            yield f"{self.name}_bucket", _labels(names, labels + ("+Inf",)), n
+            yield f"{self.name}_sum", _labels(self.label_names, labels), total
+            yield f"{self.name}_count", _labels(self.label_names, labels), n
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ---- HTTP (app/main.py middleware and InstrumentedRoute) ----
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "End-to-end request latency",
+    labels=("method", "route", "status"),
+))
+http_request_phase = registry.register(Histogram(
+    "http_request_phase_seconds",
+    "Request time by phase: sql (statements), handler (route function, "
+    "includes sql), serialize (everything outside the route function: "
+    "response model validation, JSON encoding, dependency setup)",
+    labels=("route", "phase"),
+))
+
+# ---- SQL (app/database.py engine events) ----
+db_statement_duration = registry.register(Histogram(
+    "db_statement_duration_seconds",
+    "Statement execution time",
+    labels=("operation",),
+))
+db_statement_rows = registry.register(Counter(
+    "db_statement_rows_total",
+    "Rows returned or affected by statements",
+    labels=("operation",),
+))
+db_slow_statements = registry.register(Counter(
+    "db_slow_statements_total",
+    "Statements slower than SLOW_QUERY_MS",
+    labels=("operation",),
+))
+
+# ---- Connection pool (app/database.py) ----
+db_pool_checkout_wait = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection",
+))
+db_pool_timeouts = registry.register(Counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that gave up after DB_POOL_TIMEOUT",
+))
+
+
+# ---- Per-request accumulation ----
+class RequestTimings:
+    __slots__ = ("sql_seconds", "handler_seconds")
+
+    def __init__(self):
+        self.sql_seconds = 0.0
+        self.handler_seconds = None
+
+
+# Set by the middleware; SQL hooks and the route class add to the same object
+request_timings: ContextVar[RequestTimings | None] = ContextVar("request_timings", default=None)
+
+
+def statement_operation(statement):
+    # Coarse statement label: COUNT(*) totals and EXPLAIN estimates are told
+    # apart from the page queries they accompany
+    head = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    if head == "SELECT" and "COUNT(*)" in statement[:40].upper():
+        return "count"
+    return head.lower() or "unknown"
+
+
+class InstrumentedRoute(APIRoute):
+    """
+    Route class that times the route function itself, so the middleware can
+    split a request into handler and serialization time.
+
+    Use as APIRouter(route_class=InstrumentedRoute).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        call = self.dependant.call
+
+        @functools.wraps(call)
+        async def timed_call(*call_args, **call_kwargs):
+            start = time.perf_counter()
+            try:
+                return await call(*call_args, **call_kwargs)
+            finally:
+                timings = request_timings.get()
+                if timings is not None:
+                    timings.handler_seconds = time.perf_counter() - start
+
+        self.dependant.call = timed_call
@@ -0,0 +1,114 @@
+import base64
+import binascii
+import json
+import threading
+from collections import OrderedDict
+
+from fastapi import HTTPException
+from sqlalchemy import text
+
+# Keyset pagination: a page ends with an opaque cursor holding the last row's
+# sort key and tiebreaker; the next page starts strictly after it. All sort
+# columns are DESC, so "after" is a single row comparison that walks the
+# matching (sort key, tiebreaker) index - page N costs the same as page 1.
+#
+# A keyset is a list of (column, sql_type) in sort order, tiebreaker last.
+
+# Lists that are not a PaginatedResponse return their cursor in this header
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(row, keyset):
+    # Decimals are kept as exact strings and cast back in SQL
+    values = [row[column] for column, _ in keyset]
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, keyset):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(keyset):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def keyset_condition(keyset, after, params):
+    # " AND (col, ...) < (:after_0, ...)" and the matching bind params
+    values = decode_cursor(after, keyset)
+    columns = ", ".join(column for column, _ in keyset)
+    binds = ", ".join(
+        f"CAST(:after_{i} AS {sql_type})" for i, (_, sql_type) in enumerate(keyset)
+    )
+    params.update({f"after_{i}": value for i, value in enumerate(values)})
+    return f" AND ({columns}) < ({binds})"
+
+
+def keyset_order_by(keyset):
+    return "ORDER BY " + ", ".join(f"{column} DESC" for column, _ in keyset)
+
+
+def keyset_page(rows, keyset, limit):
+    # Queries fetch limit + 1 rows; the extra row only signals a next page
+    items = rows[:limit]
+    next_cursor = encode_cursor(items[-1], keyset) if len(rows) > limit else None
+    return items, next_cursor
+
+
+# ---- TOTAL COUNTS ----
+# total_mode on the paginated routers:
+#   exact     - COUNT(*) over the filtered list on every request
+#   estimated - the planner's row estimate (EXPLAIN), no scan at all
+#   cached    - exact count, reused while the filters and scoring run match
+#   none      - no count; total is null
+# The lists are rebuilt only by scoring runs, so a cached count stays exact
+# until the next run.
+COUNT_CACHE_SIZE = 1024
+
+_count_cache = OrderedDict()
+_count_lock = threading.Lock()
+
+
+async def _exact_count(db, base_query, params):
+    return (await db.execute(text(f"SELECT COUNT(*) {base_query}"), params)).scalar()
+
+
+async def _estimated_count(db, base_query, params):
+    result = await db.execute(text(f"EXPLAIN (FORMAT JSON) SELECT 1 {base_query}"), params)
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def count_total(db, base_query, params, mode, cache_key):
+    """
+    Total for a paginated list, per total_mode.
+
+    base_query is the "FROM ... WHERE ..." part shared with the page query;
+    cache_key identifies the endpoint and scoring run (filters are taken
+    from params). Returns (total, how it was obtained) - a cache miss is
+    reported as "exact".
+    """
+    if mode == "none":
+        return None, "none"
+    if mode == "estimated":
+        return await _estimated_count(db, base_query, params), "estimated"
+    if mode == "exact":
+        return await _exact_count(db, base_query, params), "exact"
+
+    key = (cache_key, tuple(sorted(params.items())))
+    with _count_lock:
+        if key in _count_cache:
+            _count_cache.move_to_end(key)
+            return _count_cache[key], "cached"
+
+    total = await _exact_count(db, base_query, params)
+    with _count_lock:
+        _count_cache[key] = total
+        if len(_count_cache) > COUNT_CACHE_SIZE:
+            _count_cache.popitem(last=False)
+    return total, "exact"
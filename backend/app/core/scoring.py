@@ -0,0 +1,23 @@
+from sqlalchemy import text
+
+# Header set on responses served from the materialized scoring tables, so
+# clients can tell which scoring run produced the data they are looking at
+SCORING_RUN_HEADER = "X-Scoring-Run"
+
+
+async def latest_scoring_run(db):
+    # db can be an AsyncSession or an AsyncConnection
+    result = await db.execute(text("""
+        SELECT run_id, mode, peer_groups_refreshed, started_at, finished_at
+        FROM scoring_runs
+        WHERE status = 'complete'
+        ORDER BY run_id DESC
+        LIMIT 1
+    """))
+    row = result.mappings().first()
+    return dict(row) if row else None
+
+
+async def latest_scoring_run_id(db):
+    run = await latest_scoring_run(db)
+    return run["run_id"] if run else None
@@ -1,19 +1,102 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.core.config import settings 
-from sqlalchemy.orm import sessionmaker
+import logging
+import re
+import time
 
-engine = create_engine(settings.database_url)
+from sqlalchemy import event
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.core.config import settings
+from app.core import metrics
 
-sessionLocal = sessionmaker(
-    autocommit=False,
+slow_query_log = logging.getLogger("app.sql")
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    # Times every checkout, including waits for a free connection when the
+    # pool and its overflow are exhausted
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sa_exc.TimeoutError:
+            metrics.db_pool_timeouts.inc()
+            raise
+        finally:
+            metrics.db_pool_checkout_wait.observe(time.perf_counter() - start)
+
+
+# psycopg 3 in async mode (postgresql+psycopg://); every request awaits its
+# queries instead of holding a threadpool worker
+engine = create_async_engine(
+    settings.database_url,
+    poolclass=InstrumentedPool,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    connect_args={"options": f"-c statement_timeout={settings.db_statement_timeout_ms}"},
+)
+
+sessionLocal = async_sessionmaker(
+    engine,
+    class_=AsyncSession,
     autoflush=False,
-    bind=engine
+    expire_on_commit=False,
 )
 
-def get_db():
-    db = sessionLocal()
-    try:
+async def get_db():
+    async with sessionLocal() as db:
         yield db
-    finally: 
-        db.close()
\ No newline at end of file
+
+
+# ---- Statement timing ----
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("statement_start", []).append(time.perf_counter())
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["statement_start"].pop()
+    operation = metrics.statement_operation(statement)
+    metrics.db_statement_duration.observe(elapsed, operation)
+    if cursor.rowcount is not None and cursor.rowcount >= 0:
+        metrics.db_statement_rows.inc(operation, amount=cursor.rowcount)
+
+    timings = metrics.request_timings.get()
+    if timings is not None:
+        timings.sql_seconds += elapsed
+
+    if elapsed * 1000 >= settings.slow_query_ms:
+        metrics.db_slow_statements.inc(operation)
+        slow_query_log.warning(
+            "slow query %.1f ms, %s rows: %s | params=%r",
+            elapsed * 1000,
+            cursor.rowcount,
+            re.sub(r"\s+", " ", statement).strip()[:1000],
+            parameters,
+        )
+
+
+# ---- Pool saturation (read at scrape time) ----
+def _pool_capacity():
+    return settings.db_pool_size + max(settings.db_max_overflow, 0)
+
+metrics.registry.register(metrics.Gauge(
+    "db_pool_checked_out", "Connections currently checked out",
+    lambda: engine.pool.checkedout(),
+))
+metrics.registry.register(metrics.Gauge(
+    "db_pool_overflow", "Connections open beyond DB_POOL_SIZE",
+    lambda: max(engine.pool.overflow(), 0),
+))
+metrics.registry.register(metrics.Gauge(
+    "db_pool_capacity", "DB_POOL_SIZE + DB_MAX_OVERFLOW",
+    _pool_capacity,
+))
+metrics.registry.register(metrics.Gauge(
+    "db_pool_saturation", "Checked-out connections / capacity",
+    lambda: engine.pool.checkedout() / _pool_capacity(),
+))
@@ -1,17 +1,73 @@
-from fastapi import FastAPI
-from app.routers import providers, cpt, risk, analytics
+import asyncio
+import time
+from contextlib import asynccontextmanager, suppress
+
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from app.routers import providers, cpt, risk, analytics, export, claims
+from app.core.baselines import snapshot_store
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core import metrics
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Keeps the /claims/score snapshot on the latest scoring run
+    watcher = asyncio.create_task(snapshot_store.watch(settings.snapshot_poll_seconds))
+    yield
+    watcher.cancel()
+    with suppress(asyncio.CancelledError):
+        await watcher
+
 
 app = FastAPI(
     title="Health Fraud Analytics API",
     description="CPT Complexity, BETOS exposure, and provider risk analytics",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.include_router(providers.router, prefix="/providers", tags=["Providers"])
 app.include_router(cpt.router, prefix="/cpt", tags=["CPT"])
 app.include_router(risk.router, prefix="/risk", tags=["Risk"])
 app.include_router(analytics.router)
+app.include_router(export.router, prefix="/export", tags=["Export"])
+app.include_router(claims.router, prefix="/claims", tags=["Claims"])
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    timings = metrics.RequestTimings()
+    token = metrics.request_timings.set(timings)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.request_timings.reset(token)
+        # Route template, not the raw path, to keep label cardinality bounded
+        route = request.scope.get("route")
+        route = route.path if route is not None else "unmatched"
+        metrics.http_request_duration.observe(elapsed, request.method, route, status)
+        metrics.http_request_phase.observe(timings.sql_seconds, route, "sql")
+        if timings.handler_seconds is not None:
+            metrics.http_request_phase.observe(timings.handler_seconds, route, "handler")
+            metrics.http_request_phase.observe(elapsed - timings.handler_seconds, route, "serialize")
 
 @app.get("/")
-def health_check():
-    return {"status": "ok"}
\ No newline at end of file
+async def health_check():
+    return {"status": "ok"}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return response_cache.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(
+        metrics.registry.render(),
+        media_type="text/plain; version=0.0.4",
+    )
\ No newline at end of file
@@ -1,45 +1,96 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+import pyarrow as pa
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
+from app.core.cache import cached_response
+from app.core.columnar import columnar_response, response_format
+from app.core.metrics import InstrumentedRoute
+from app.core.pagination import (
+    NEXT_CURSOR_HEADER,
+    keyset_condition,
+    keyset_order_by,
+    keyset_page,
+)
+from app.core.scoring import SCORING_RUN_HEADER, latest_scoring_run_id
 from app.schemas.peer import PeerComparisonOut
 from sqlalchemy import text
 from typing import List
 
-router = APIRouter(prefix="/analytics", tags=["Analytics"])
+router = APIRouter(prefix="/analytics", tags=["Analytics"], route_class=InstrumentedRoute)
+
+# Sort key + tiebreakers, matching provider_peer_comparison_mat_*keyset_idx
+PEER_KEYSET = [
+    ("peer_percentile", "DOUBLE PRECISION"),
+    ("provider_id", "BIGINT"),
+    ("cpt_code", "TEXT"),
+]
+
+PEER_SCHEMA = pa.schema([
+    ("provider_id", pa.int64()),
+    ("specialty", pa.string()),
+    ("cpt_code", pa.string()),
+    ("usage_count", pa.int64()),
+    ("risk_contribution", pa.float64()),
+    ("peer_rank", pa.int64()),
+    ("peer_percentile", pa.float64()),
+    ("peer_group_size", pa.int64()),
+])
 
 @router.get(
     "/peer-comparison",
     response_model=List[PeerComparisonOut]
 )
-def peer_comparison(
+@cached_response("analytics.peer-comparison")
+async def peer_comparison(
+    response: Response,
     specialty: str | None = None,
     min_percentile: float = Query(0.9, ge=0, le=1),
     limit: int = 20,
     offset: int = 0,
-    db: Session = Depends(get_db)
+    after: str | None = None,
+    fmt: str = Depends(response_format),
+    db: AsyncSession = Depends(get_db)
 ):
     query = """
-    SELECT *
-    FROM provider_peer_comparison_strict
+    SELECT
+        provider_id,
+        specialty,
+        cpt_code,
+        usage_count,
+        risk_contribution,
+        peer_rank,
+        peer_percentile,
+        peer_group_size
+    FROM provider_peer_comparison_mat
     WHERE peer_percentile >= :min_percentile
     """
 
-    if specialty:
-        query += " AND specialty = :specialty"
-
-    query += """
-    ORDER BY peer_percentile DESC
-    LIMIT :limit OFFSET :offset
-    """
-
     params = {
         "min_percentile": min_percentile,
-        "limit": limit,
+        "limit": limit + 1,
         "offset": offset,
     }
 
-    if specialty: 
+    if specialty:
+        query += " AND specialty = :specialty"
         params["specialty"] = specialty
 
-    result = db.execute(text(query), params).mappings().all()
-    return result
\ No newline at end of file
+    if after:
+        query += keyset_condition(PEER_KEYSET, after, params)
+
+    query += f"""
+    {keyset_order_by(PEER_KEYSET)}
+    LIMIT :limit OFFSET :offset
+    """
+
+    run_id = await latest_scoring_run_id(db)
+    if run_id:
+        response.headers[SCORING_RUN_HEADER] = str(run_id)
+
+    rows = (await db.execute(text(query), params)).mappings().all()
+    items, next_cursor = keyset_page(rows, PEER_KEYSET, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if fmt != "json":
+        return columnar_response(items, PEER_SCHEMA, fmt, headers=dict(response.headers))
+    return items
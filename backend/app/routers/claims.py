@@ -0,0 +1,58 @@
+import math
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Response
+
+from app.core.baselines import score_claims, snapshot_store
+from app.core.metrics import InstrumentedRoute
+from app.core.scoring import SCORING_RUN_HEADER
+from app.schemas.claims import ClaimBatchIn, ClaimIn, ClaimScoreOut
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+
+def _number(value):
+    return None if value is None or math.isnan(value) else value
+
+
+@router.post("/score", response_model=ClaimScoreOut | List[ClaimScoreOut])
+async def score(body: ClaimIn | ClaimBatchIn, response: Response):
+    """
+    Instant deviation / complexity signal for an incoming claim or batch,
+    served from the in-process scoring snapshot (no SQL on this path).
+    """
+    snapshot = snapshot_store.snapshot
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail="Scoring snapshot not loaded yet")
+    if snapshot.run_id:
+        response.headers[SCORING_RUN_HEADER] = str(snapshot.run_id)
+
+    claims = body if isinstance(body, list) else [body]
+    scores = score_claims(
+        snapshot,
+        [c.provider_id for c in claims],
+        [c.cpt_code for c in claims],
+    )
+    columns = {name: values.tolist() for name, values in scores.items()}
+
+    items = []
+    for i, claim in enumerate(claims):
+        specialty = columns["specialty_idx"][i]
+        complexity = columns["complexity_score"][i]
+        level = columns["risk_level_idx"][i]
+        items.append({
+            "claim_id": claim.claim_id,
+            "provider_id": claim.provider_id,
+            "cpt_code": claim.cpt_code,
+            "specialty": snapshot.specialties[specialty] if specialty >= 0 else None,
+            "usage_count": columns["usage_count"][i],
+            "peer_group_size": columns["peer_group_size"][i],
+            "peer_avg_usage": _number(columns["peer_avg_usage"][i]),
+            "peer_std_usage": _number(columns["peer_std_usage"][i]),
+            "deviation": _number(columns["deviation"][i]),
+            "usage_z": _number(columns["usage_z"][i]),
+            "complexity_score": complexity if complexity >= 0 else None,
+            "risk_level": snapshot.risk_levels[level] if level >= 0 else None,
+            "risk_contribution": _number(columns["risk_contribution"][i]),
+        })
+    return items if isinstance(body, list) else items[0]
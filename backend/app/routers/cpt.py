@@ -1,27 +1,65 @@
-from fastapi import APIRouter, Depends
+import pyarrow as pa
+from fastapi import APIRouter, Depends, Response
 from sqlalchemy import text
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.schemas import PaginatedResponse, CPTComplexityOut
+from app.core.cache import cached_response
+from app.core.columnar import columnar_response, response_format
+from app.core.metrics import InstrumentedRoute
+from app.core.pagination import (
+    NEXT_CURSOR_HEADER,
+    count_total,
+    keyset_condition,
+    keyset_order_by,
+    keyset_page,
+)
+from app.core.scoring import SCORING_RUN_HEADER, latest_scoring_run_id
+from app.schemas import PaginatedResponse, CPTComplexityOut, TotalMode
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+# Sort key + tiebreaker, matching cpt_complexity_mat_keyset_idx
+HIGH_RISK_KEYSET = [
+    ("complexity_score", "INT"),
+    ("total_claims", "BIGINT"),
+    ("cpt_code", "TEXT"),
+]
+
+HIGH_RISK_SCHEMA = pa.schema([
+    ("cpt_code", pa.string()),
+    ("rbcs_id", pa.string()),
+    ("rbcs_cat_desc", pa.string()),
+    ("complexity_score", pa.int32()),
+    ("risk_level", pa.string()),
+    ("total_claims", pa.int64()),
+    ("avg_claim_amount", pa.float64()),
+])
 
-router = APIRouter()
+# Page metadata for columnar responses, which have no JSON envelope
+TOTAL_COUNT_HEADER = "X-Total-Count"
+TOTAL_MODE_HEADER = "X-Total-Mode"
 
 
 @router.get(
     "/high-risk",
     response_model=PaginatedResponse[CPTComplexityOut]
 )
-def high_risk_cpts(
+@cached_response("cpt.high-risk")
+async def high_risk_cpts(
+    response: Response,
     min_complexity: int = 4,
     risk_level: str | None = None,
     rbcs_category: str | None = None,
     limit: int = 20,
     offset: int = 0,
-    db: Session = Depends(get_db)
+    after: str | None = None,
+    total_mode: TotalMode = "cached",
+    fmt: str = Depends(response_format),
+    db: AsyncSession = Depends(get_db)
 ):
     base_query = """
-        FROM cpt_complexity_view
+        FROM cpt_complexity_mat
         WHERE complexity_score >= :min_complexity
     """  
     params = {"min_complexity": min_complexity}
@@ -34,12 +72,19 @@ def high_risk_cpts(
         base_query += " AND rbcs_cat_desc = :rbcs_category"
         params["rbcs_category"] = rbcs_category
 
-    total = db.execute(
-        text(f"SELECT COUNT(*) {base_query}"),
-        params
-    ).scalar()
+    run_id = await latest_scoring_run_id(db)
+    if run_id:
+        response.headers[SCORING_RUN_HEADER] = str(run_id)
+
+    total, total_mode = await count_total(
+        db, base_query, params, total_mode, ("high-risk", run_id)
+    )
+
+    page_query = base_query
+    if after:
+        page_query += keyset_condition(HIGH_RISK_KEYSET, after, params)
 
-    result = db.execute(
+    result = await db.execute(
         text(f"""
             SELECT
                 cpt_code,
@@ -49,26 +94,39 @@ def high_risk_cpts(
                 risk_level,
                 total_claims,
                 avg_claim_amount
-            {base_query}
-            ORDER BY complexity_score DESC, total_claims DESC
+            {page_query}
+            {keyset_order_by(HIGH_RISK_KEYSET)}
             LIMIT :limit OFFSET :offset
         """),
-        {**params, "limit": limit, "offset": offset}
+        {**params, "limit": limit + 1, "offset": offset}
     )
 
+    items, next_cursor = keyset_page(result.mappings().all(), HIGH_RISK_KEYSET, limit)
+    if fmt != "json":
+        headers = dict(response.headers)
+        headers[TOTAL_MODE_HEADER] = total_mode
+        if total is not None:
+            headers[TOTAL_COUNT_HEADER] = str(total)
+        if next_cursor:
+            headers[NEXT_CURSOR_HEADER] = next_cursor
+        return columnar_response(items, HIGH_RISK_SCHEMA, fmt, headers=headers)
     return {
         "total": total,
-        "items": result.mappings().all()
+        "total_mode": total_mode,
+        "items": items,
+        "next_cursor": next_cursor,
     }
 
 
 @router.get("/complexity")
-def cpt_complexity(
+@cached_response("cpt.complexity")
+async def cpt_complexity(
+    response: Response,
     min_score: int = 3,
     limit: int = 50,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    result = db.execute(
+    result = await db.execute(
         text("""
             SELECT
                 cpt_code,
@@ -78,7 +136,7 @@ def cpt_complexity(
                 risk_level,
                 total_claims,
                 avg_claim_amount
-            FROM cpt_complexity_view
+            FROM cpt_complexity_mat
             WHERE complexity_score >= :min_score
             ORDER BY complexity_score DESC, avg_claim_amount DESC
             LIMIT :limit
@@ -0,0 +1,109 @@
+from typing import Literal
+
+import pyarrow as pa
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+
+from app.database import engine
+from app.core.config import settings
+from app.core.export_formats import FILE_EXTENSIONS, MEDIA_TYPES, encode
+from app.core.metrics import InstrumentedRoute
+from app.core.scoring import SCORING_RUN_HEADER, latest_scoring_run_id
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+ExportFormat = Literal["ndjson", "csv", "arrow"]
+
+# Scores are exported as float8 so every format (and the Arrow schema)
+# gets plain doubles
+PROVIDER_SCORES = (
+    """
+    SELECT provider_id, fraud_risk_score::float8 AS fraud_risk_score
+    FROM provider_fraud_score_mat
+    ORDER BY fraud_risk_score DESC, provider_id
+    """,
+    pa.schema([
+        ("provider_id", pa.int64()),
+        ("fraud_risk_score", pa.float64()),
+    ]),
+)
+
+EXPLANATIONS = (
+    """
+    SELECT
+        provider_id,
+        specialty,
+        cpt_code,
+        usage_count,
+        avg_usage::float8 AS avg_usage,
+        deviation::float8 AS deviation,
+        complexity_score,
+        risk_level,
+        risk_contribution::float8 AS risk_contribution
+    FROM provider_fraud_explanation_mat
+    ORDER BY provider_id, cpt_code
+    """,
+    pa.schema([
+        ("provider_id", pa.int64()),
+        ("specialty", pa.string()),
+        ("cpt_code", pa.string()),
+        ("usage_count", pa.int64()),
+        ("avg_usage", pa.float64()),
+        ("deviation", pa.float64()),
+        ("complexity_score", pa.int32()),
+        ("risk_level", pa.string()),
+        ("risk_contribution", pa.float64()),
+    ]),
+)
+
+
+async def _stream_export(name, query, schema, fmt):
+    """
+    Stream one export through a server-side cursor.
+
+    The export runs in its own REPEATABLE READ transaction, so a scoring run
+    committing mid-export cannot mix two runs in one file, and the
+    X-Scoring-Run header matches the rows. The connection is held (and
+    closed) by the body generator, not by the request's session.
+    """
+    conn = await engine.connect()
+    try:
+        await conn.execution_options(isolation_level="REPEATABLE READ")
+        await conn.begin()
+        run_id = await latest_scoring_run_id(conn)
+    except Exception:
+        await conn.close()
+        raise
+
+    async def batches():
+        batch_rows = settings.export_batch_rows
+        result = await conn.stream(text(query), execution_options={"yield_per": batch_rows})
+        async for partition in result.partitions(batch_rows):
+            yield [tuple(row) for row in partition]
+
+    async def body():
+        try:
+            async for chunk in encode(fmt, batches(), schema):
+                yield chunk
+        finally:
+            await conn.close()
+
+    headers = {
+        "Content-Disposition": f'attachment; filename="{name}.{FILE_EXTENSIONS[fmt]}"',
+    }
+    if run_id:
+        headers[SCORING_RUN_HEADER] = str(run_id)
+    return StreamingResponse(body(), media_type=MEDIA_TYPES[fmt], headers=headers)
+
+
+@router.get("/provider-scores")
+async def export_provider_scores(format: ExportFormat = "ndjson"):
+    query, schema = PROVIDER_SCORES
+    return await _stream_export("provider_fraud_score", query, schema, format)
+
+
+@router.get("/explanations")
+async def export_explanations(format: ExportFormat = "ndjson"):
+    query, schema = EXPLANATIONS
+    return await _stream_export("provider_fraud_explanation", query, schema, format)
@@ -1,49 +1,197 @@
-from fastapi import APIRouter, Depends
+import pyarrow as pa
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy import text
-from app.database import engine, get_db
-from sqlalchemy.orm import Session
-from app.schemas import PaginatedResponse, ProviderRiskOut
+from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import cached_response
+from app.core.columnar import column_dict, columnar_response, response_format
+from app.core.metrics import InstrumentedRoute
+from app.core.pagination import count_total, keyset_condition, keyset_order_by, keyset_page
+from app.core.scoring import SCORING_RUN_HEADER, latest_scoring_run_id
+from provider_search import search_sql
+from app.schemas import (
+    MAX_SEARCH_RESULTS,
+    PaginatedResponse,
+    ProviderRiskBatchIn,
+    ProviderProfileOut,
+    ProviderRiskOut,
+    ProviderSearchOut,
+    TotalMode,
+)
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
+
+# Sort key + tiebreaker, matching provider_risk_summary_mat_*keyset_idx
+TOP_RISK_KEYSET = [("avg_deviation", "NUMERIC"), ("provider_id", "BIGINT")]
 
 @router.get("/top-risk", response_model=PaginatedResponse[ProviderRiskOut])
-def top_risk_providers(
+@cached_response("providers.top-risk")
+async def top_risk_providers(
+    response: Response,
     limit: int = 20,
     offset: int = 0,
+    after: str | None = None,
     specialty: str | None = None,
     min_avg_deviation: float | None = None,
-    db: Session = Depends(get_db)
+    total_mode: TotalMode = "cached",
+    db: AsyncSession = Depends(get_db)
     ):
 
     base_query = """
-    FROM provider_risk_summary
+    FROM provider_risk_summary_mat
     WHERE 1=1
 """
     params = {}
 
     if specialty:
-        base_query += "AND specialty = :specialty"
+        base_query += " AND specialty = :specialty"
         params["specialty"] = specialty
 
     if min_avg_deviation is not None:
-        base_query += "AND avg_deviation >= :min_avg_deviation"
+        base_query += " AND avg_deviation >= :min_avg_deviation"
         params["min_avg_deviation"] = min_avg_deviation
 
+    run_id = await latest_scoring_run_id(db)
+    if run_id:
+        response.headers[SCORING_RUN_HEADER] = str(run_id)
+
     # Total count for pagination
-    total = db.execute(text(f"SELECT COUNT(*) {base_query}"), params).scalar()
-    
-    # Fetch paginated results
-    result = db.execute(text(f"""
+    total, total_mode = await count_total(
+        db, base_query, params, total_mode, ("top-risk", run_id)
+    )
+
+    page_query = base_query
+    if after:
+        page_query += keyset_condition(TOP_RISK_KEYSET, after, params)
+
+    # Fetch paginated results (one extra row tells us whether there is a next page)
+    result = await db.execute(text(f"""
     SELECT provider_id,
         specialty,
         avg_deviation,
         total_claims
-    {base_query}
-        ORDER BY avg_deviation DESC
+    {page_query}
+        {keyset_order_by(TOP_RISK_KEYSET)}
         LIMIT :limit OFFSET :offset
-"""), {**params, "limit": limit, "offset": offset})
-    
+"""), {**params, "limit": limit + 1, "offset": offset})
+
+    items, next_cursor = keyset_page(result.mappings().all(), TOP_RISK_KEYSET, limit)
     return {
         "total": total,
-        "items": result.mappings().all()
-    }
\ No newline at end of file
+        "total_mode": total_mode,
+        "items": items,
+        "next_cursor": next_cursor,
+    }
+
+
+@router.get("/search", response_model=list[ProviderSearchOut])
+@cached_response("providers.search")
+async def search_providers(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_RESULTS),
+    db: AsyncSession = Depends(get_db)
+    ):
+    """
+    Typeahead search. A numeric q matches provider_id prefixes; anything
+    else matches providers whose specialty contains every word of q
+    (case-insensitive, e.g. "card surg" finds "Cardiac Surgery").
+
+    The statements live in provider_search.py, shared with the dashboard.
+    Neither branch depends on the number of providers.
+    """
+    run_id = await latest_scoring_run_id(db)
+    if run_id:
+        response.headers[SCORING_RUN_HEADER] = str(run_id)
+
+    query = search_sql(q, limit, param=":{}")
+    if query is None:
+        return []
+    sql, params = query
+    result = await db.execute(text(sql), params)
+    return result.mappings().all()
+
+
+@router.get("/{provider_id}/profile", response_model=ProviderProfileOut)
+@cached_response("providers.profile")
+async def provider_profile(
+    provider_id: int,
+    response: Response,
+    db: AsyncSession = Depends(get_db)
+    ):
+    """
+    Everything the provider drill-down shows, from one primary key lookup
+    on provider_profile (rebuilt by each scoring run).
+    """
+    run_id = await latest_scoring_run_id(db)
+    if run_id:
+        response.headers[SCORING_RUN_HEADER] = str(run_id)
+
+    result = await db.execute(text("""
+    SELECT provider_id,
+        specialty,
+        total_claims,
+        avg_claim_amount,
+        claims_peer_z,
+        risk_tier,
+        max_spike_risk,
+        spike_month,
+        fraud_risk_score,
+        top_explanations
+    FROM provider_profile
+    WHERE provider_id = :provider_id
+"""), {"provider_id": provider_id})
+
+    row = result.mappings().first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Provider not found")
+    return row
+
+BATCH_RISK_SCHEMA = pa.schema([
+    ("provider_id", pa.int64()),
+    ("specialty", pa.string()),
+    ("total_claims", pa.int64()),
+    ("avg_claim_amount", pa.float64()),
+    ("claims_peer_z", pa.float64()),
+    ("risk_tier", pa.string()),
+    ("max_spike_risk", pa.float64()),
+    ("spike_month", pa.date32()),
+])
+
+@router.post("/risk:batch")
+async def provider_risk_batch(
+    body: ProviderRiskBatchIn,
+    response: Response,
+    fmt: str = Depends(response_format),
+    db: AsyncSession = Depends(get_db)
+    ):
+    """
+    Risk for a batch of providers in one set-based query.
+
+    Reads provider_profile, the scoring-run table that holds the tier,
+    provider_peer_risk, provider_summary and the spike risk score, so the
+    tier is the one the dashboards show. Every distinct requested id gets a
+    row; unknown ids have null columns.
+    """
+    run_id = await latest_scoring_run_id(db)
+    if run_id:
+        response.headers[SCORING_RUN_HEADER] = str(run_id)
+
+    result = await db.execute(text("""
+    SELECT ids.provider_id,
+        pp.specialty,
+        pp.total_claims,
+        pp.avg_claim_amount::float8 AS avg_claim_amount,
+        pp.claims_peer_z::float8 AS claims_peer_z,
+        pp.risk_tier,
+        pp.max_spike_risk::float8 AS max_spike_risk,
+        pp.spike_month
+    FROM (SELECT DISTINCT unnest(CAST(:ids AS BIGINT[])) AS provider_id) ids
+    LEFT JOIN provider_profile pp ON pp.provider_id = ids.provider_id
+    ORDER BY ids.provider_id
+"""), {"ids": body.provider_ids})
+
+    rows = result.mappings().all()
+    if fmt != "json":
+        return columnar_response(rows, BATCH_RISK_SCHEMA, fmt, headers=dict(response.headers))
+    return column_dict(rows, BATCH_RISK_SCHEMA)
@@ -1,40 +1,163 @@
-from fastapi import APIRouter
+import pyarrow as pa
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy import text
-from app.database import engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db
+from app.core.cache import cached_response
+from app.core.columnar import column_dict, columnar_response, response_format
+from app.core.metrics import InstrumentedRoute
+from app.core.scoring import SCORING_RUN_HEADER, latest_scoring_run, latest_scoring_run_id
+from app.schemas import (
+    MAX_PROVIDER_EXPLANATIONS,
+    ProviderExplanationBatchIn,
+    ProviderExplanationOut,
+    ScoringRunOut,
+)
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
+
+@router.get("/scoring-run", response_model=ScoringRunOut)
+async def scoring_run(db: AsyncSession = Depends(get_db)):
+    run = await latest_scoring_run(db)
+    if run is None:
+        raise HTTPException(status_code=404, detail="No completed scoring run")
+    return run
 
 @router.get("/providers")
-def provider_risk(limit: int = 20):
-    with engine.connect() as conn:
-        result = conn.execute(text("""
-            SELECT
-              provider_id,
-              fraud_risk_score
-            FROM provider_fraud_score
-            ORDER BY fraud_risk_score DESC
-             LIMIT :limit
-        """), {"limit": limit})
-
-        return [dict(row._mapping) for row in result]
-    
+@cached_response("risk.providers")
+async def provider_risk(
+    response: Response,
+    limit: int = 20,
+    db: AsyncSession = Depends(get_db)
+):
+    run = await latest_scoring_run(db)
+    if run:
+        response.headers[SCORING_RUN_HEADER] = str(run["run_id"])
+
+    result = await db.execute(text("""
+        SELECT
+          provider_id,
+          fraud_risk_score
+        FROM provider_fraud_score_mat
+        ORDER BY fraud_risk_score DESC
+         LIMIT :limit
+    """), {"limit": limit})
+
+    return result.mappings().all()
+
 @router.get("/explanations")
-def provider_explanations(limit: int = 50):
-    with engine.connect() as conn:
-        result = conn.execute(text("""
-            SELECT
-                provider_id,
-                specialty,
-                cpt_code,
-                usage_count,
-                avg_usage,
-                deviation,
-                complexity_score,
-                risk_level,
-                risk_contribution
-                FROM provider_fraud_explanation
-                ORDER BY risk_contribution DESC
-                LIMIT :limit                          
+@cached_response("risk.explanations")
+async def provider_explanations(
+    response: Response,
+    limit: int = 50,
+    db: AsyncSession = Depends(get_db)
+):
+    run = await latest_scoring_run(db)
+    if run:
+        response.headers[SCORING_RUN_HEADER] = str(run["run_id"])
+
+    result = await db.execute(text("""
+        SELECT
+            provider_id,
+            specialty,
+            cpt_code,
+            usage_count,
+            avg_usage,
+            deviation,
+            complexity_score,
+            risk_level,
+            risk_contribution
+            FROM provider_fraud_explanation_mat
+            ORDER BY risk_contribution DESC
+            LIMIT :limit
 """), {"limit": limit})
-        return [dict(row.mapping) for row in result]
+    return result.mappings().all()
+
+@router.get(
+    "/providers/{provider_id}/explanations",
+    response_model=list[ProviderExplanationOut],
+)
+@cached_response("risk.provider-explanations")
+async def provider_top_explanations(
+    provider_id: int,
+    response: Response,
+    limit: int = Query(MAX_PROVIDER_EXPLANATIONS, ge=1, le=MAX_PROVIDER_EXPLANATIONS),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    The provider's top CPT explanations by risk_contribution, from
+    provider_explanation_topk (a primary key range scan). Providers with no
+    positive contribution return an empty list.
+    """
+    run_id = await latest_scoring_run_id(db)
+    if run_id:
+        response.headers[SCORING_RUN_HEADER] = str(run_id)
+
+    result = await db.execute(text("""
+        SELECT
+            rank,
+            cpt_code,
+            usage_count,
+            avg_usage,
+            deviation,
+            complexity_score,
+            risk_level,
+            risk_contribution
+        FROM provider_explanation_topk
+        WHERE provider_id = :provider_id
+          AND rank <= :limit
+        ORDER BY rank
+"""), {"provider_id": provider_id, "limit": limit})
+    return result.mappings().all()
+
+EXPLANATION_BATCH_SCHEMA = pa.schema([
+    ("provider_id", pa.int64()),
+    ("rank", pa.int32()),
+    ("cpt_code", pa.string()),
+    ("usage_count", pa.int64()),
+    ("avg_usage", pa.float64()),
+    ("deviation", pa.float64()),
+    ("complexity_score", pa.int32()),
+    ("risk_level", pa.string()),
+    ("risk_contribution", pa.float64()),
+])
+
+@router.post("/providers/explanations:batch")
+async def provider_top_explanations_batch(
+    body: ProviderExplanationBatchIn,
+    response: Response,
+    fmt: str = Depends(response_format),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Top explanations for a batch of providers in one query: the ids are
+    bound as an array and each reads its own provider_explanation_topk
+    range. One row per (provider_id, rank), ordered that way; providers
+    without explanations have no rows.
+    """
+    run_id = await latest_scoring_run_id(db)
+    if run_id:
+        response.headers[SCORING_RUN_HEADER] = str(run_id)
+
+    result = await db.execute(text("""
+        SELECT
+            k.provider_id,
+            k.rank,
+            k.cpt_code,
+            k.usage_count,
+            k.avg_usage::float8 AS avg_usage,
+            k.deviation::float8 AS deviation,
+            k.complexity_score,
+            k.risk_level,
+            k.risk_contribution::float8 AS risk_contribution
+        FROM (SELECT DISTINCT unnest(CAST(:ids AS BIGINT[])) AS provider_id) ids
+        JOIN provider_explanation_topk k
+          ON k.provider_id = ids.provider_id
+         AND k.rank <= :limit
+        ORDER BY k.provider_id, k.rank
+"""), {"ids": body.provider_ids, "limit": body.limit})
 
+    rows = result.mappings().all()
+    if fmt != "json":
+        return columnar_response(rows, EXPLANATION_BATCH_SCHEMA, fmt, headers=dict(response.headers))
+    return column_dict(rows, EXPLANATION_BATCH_SCHEMA)
@@ -1 +1 @@
-from .schemas import PaginatedResponse, ProviderRiskOut, CPTComplexityOut
\ No newline at end of file
+from .schemas import PaginatedResponse, ProviderRiskOut, CPTComplexityOut, ScoringRunOut, TotalMode, ProviderRiskBatchIn, ProviderSearchOut, MAX_SEARCH_RESULTS, ProviderExplanationOut, ProviderProfileOut, ProviderExplanationBatchIn, MAX_PROVIDER_EXPLANATIONS
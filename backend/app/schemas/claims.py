@@ -0,0 +1,29 @@
+from typing import Annotated, List
+
+from pydantic import BaseModel, Field
+
+# Upper bound on claims per /claims/score request
+MAX_SCORE_BATCH = 10000
+
+class ClaimIn(BaseModel):
+    claim_id: str | None = None
+    provider_id: int
+    cpt_code: str
+
+ClaimBatchIn = Annotated[List[ClaimIn], Field(min_length=1, max_length=MAX_SCORE_BATCH)]
+
+class ClaimScoreOut(BaseModel):
+    claim_id: str | None
+    provider_id: int
+    cpt_code: str
+    specialty: str | None
+    # Provider's usage of this CPT, counting this claim
+    usage_count: int
+    peer_group_size: int
+    peer_avg_usage: float | None
+    peer_std_usage: float | None
+    deviation: float | None
+    usage_z: float | None
+    complexity_score: int | None
+    risk_level: str | None
+    risk_contribution: float | None
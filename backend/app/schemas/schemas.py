@@ -1,9 +1,14 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Generic, TypeVar, List
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Generic, TypeVar, List, Literal
 from decimal import Decimal
+from datetime import date, datetime
+from explanation_topk import EXPLANATION_TOP_K
 
 T = TypeVar("T")
 
+# How PaginatedResponse.total was obtained (see app.core.pagination.count_total)
+TotalMode = Literal["exact", "estimated", "cached", "none"]
+
 class ProviderRiskOut(BaseModel):
     # Enable Pydantic to work with SQLAlchemy models
     model_config = ConfigDict(from_attributes=True) 
@@ -13,9 +18,58 @@ class ProviderRiskOut(BaseModel):
     avg_deviation: float
     total_claims: int
 
+# Upper bound on ids per /providers/risk:batch request
+MAX_BATCH_PROVIDERS = 50000
+
+class ProviderRiskBatchIn(BaseModel):
+    provider_ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_PROVIDERS)
+
+# Upper bound on /providers/search results
+MAX_SEARCH_RESULTS = 50
+
+class ProviderSearchOut(BaseModel):
+    provider_id: int
+    specialty: str | None
+    # Which part of the query matched: a provider_id prefix or the specialty
+    matched_on: Literal["provider_id", "specialty"]
+
+# Explanation rows kept per provider by the scoring run
+MAX_PROVIDER_EXPLANATIONS = EXPLANATION_TOP_K
+
+class ProviderExplanationOut(BaseModel):
+    # 1 = the provider's largest risk_contribution
+    rank: int
+    cpt_code: str
+    usage_count: int
+    avg_usage: float
+    deviation: float
+    complexity_score: int | None
+    risk_level: str | None
+    risk_contribution: float
+
+class ProviderProfileOut(BaseModel):
+    provider_id: int
+    specialty: str
+    total_claims: int
+    avg_claim_amount: float | None
+    claims_peer_z: float | None
+    risk_tier: str
+    max_spike_risk: float | None
+    spike_month: date | None
+    fraud_risk_score: float | None
+    # The provider's highest risk_contribution CPTs, largest first
+    top_explanations: List[ProviderExplanationOut]
+
+class ProviderExplanationBatchIn(BaseModel):
+    provider_ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_PROVIDERS)
+    limit: int = Field(MAX_PROVIDER_EXPLANATIONS, ge=1, le=MAX_PROVIDER_EXPLANATIONS)
+
 class PaginatedResponse(BaseModel, Generic[T]):
-    total: int
+    total: int | None
+    total_mode: TotalMode = "exact"
     items: List[T]
+    # Pass as `after=` to fetch the next page; None on the last page
+    next_cursor: str | None = None
 
 class CPTComplexityOut(BaseModel):
     cpt_code: str
@@ -28,3 +82,12 @@ class CPTComplexityOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+class ScoringRunOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    run_id: int
+    mode: str
+    peer_groups_refreshed: int | None
+    started_at: datetime
+    finished_at: datetime | None
@@ -0,0 +1,265 @@
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Rows serialized per COPY buffer. Keeps each worker's memory flat no matter
+# how large the slice it was handed is.
+COPY_BATCH_ROWS = 100_000
+DEFAULT_WORKERS = int(os.getenv("BULK_LOAD_WORKERS", "4"))
+
+
+# ---- DATABASE CONNECTION ----
+def get_connection():
+    return psycopg2.connect(
+        dbname=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST", "localhost"),
+        port=os.getenv("DB_PORT", "5432"),
+    )
+
+
+def staging_name(table):
+    return f"{table}_staging"
+
+
+# ---- STAGING TABLES ----
+def create_staging_table(cur, table):
+    # UNLOGGED skips WAL for the raw load; it is a regular (not TEMP) table so
+    # that every parallel worker connection can COPY into it.
+    staging = staging_name(table)
+    cur.execute(f"DROP TABLE IF EXISTS {staging}")
+    cur.execute(f"CREATE UNLOGGED TABLE {staging} (LIKE {table} INCLUDING DEFAULTS)")
+    return staging
+
+
+def drop_staging_table(cur, table):
+    cur.execute(f"DROP TABLE IF EXISTS {staging_name(table)}")
+
+
+# ---- COPY WORKERS ----
+def copy_frame(conn, df, table, columns, commit=True):
+    # Streams df into `table` as CSV, one COPY per COPY_BATCH_ROWS rows
+    copy_sql = (
+        f"COPY {table} ({', '.join(columns)}) "
+        "FROM STDIN WITH (FORMAT csv, NULL '')"
+    )
+    with conn.cursor() as cur:
+        for start in range(0, len(df), COPY_BATCH_ROWS):
+            batch = df.iloc[start:start + COPY_BATCH_ROWS]
+            buf = io.StringIO()
+            batch[columns].to_csv(buf, index=False, header=False)
+            buf.seek(0)
+            cur.copy_expert(copy_sql, buf)
+    if commit:
+        conn.commit()
+
+
+def _copy_worker(worker_id, df, table, columns):
+    start = time.perf_counter()
+    conn = get_connection()
+    try:
+        copy_frame(conn, df, table, columns)
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - start
+    return {
+        "worker": worker_id,
+        "rows": len(df),
+        "seconds": elapsed,
+        "rows_per_sec": len(df) / elapsed if elapsed else 0.0,
+    }
+
+
+def parallel_copy(df, table, columns, workers=DEFAULT_WORKERS):
+    # Splits df into `workers` slices and COPYs each over its own connection
+    if df.empty:
+        return []
+
+    workers = max(1, min(workers, len(df)))
+    slices = np.array_split(np.arange(len(df)), workers)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_copy_worker, i, df.iloc[idx], table, columns)
+            for i, idx in enumerate(slices)
+        ]
+        return [f.result() for f in futures]
+
+
+def print_worker_stats(table, worker_stats):
+    for worker, (rows, seconds) in sorted(worker_stats.items()):
+        print(
+            f"  [{table}] worker {worker}: {rows} rows "
+            f"in {seconds:.2f}s ({rows / seconds if seconds else 0:,.0f} rows/sec)"
+        )
+
+
+# ---- MERGE ----
+def distinct_rows_sql(source, columns, key):
+    # One row per non-NULL key of `source`. Duplicate keys keep the smallest
+    # row by (key, every other column), never whichever the parallel COPY
+    # workers happened to write first, so reloading the same data always
+    # keeps the same row and updates nothing.
+    values = [c for c in columns if c != key]
+    return f"""
+        SELECT DISTINCT ON ({key}) {", ".join(columns)}
+        FROM {source}
+        WHERE {key} IS NOT NULL
+        ORDER BY {", ".join([key] + values)}
+    """
+
+
+def merge_staging(cur, table, columns, key, update=False):
+    # Moves staged rows into the real table; returns (inserted, updated).
+    # Duplicate keys inside the staged batch collapse to one row
+    # (distinct_rows_sql). Keys that already exist are skipped, or with
+    # update=True overwritten where any value changed. UPDATE ... FROM plus
+    # INSERT ... WHERE NOT EXISTS needs no unique index on `key`
+    # (partitioned claims has none).
+    staged = distinct_rows_sql(staging_name(table), columns, key)
+    cols = ", ".join(columns)
+    values = [c for c in columns if c != key]
+    updated = 0
+    if update and values:
+        cur.execute(f"""
+            UPDATE {table} t
+            SET {", ".join(f"{c} = s.{c}" for c in values)}
+            FROM ({staged}) s
+            WHERE t.{key} = s.{key}
+              AND ({", ".join(f"t.{c}" for c in values)})
+                  IS DISTINCT FROM ({", ".join(f"s.{c}" for c in values)})
+        """)
+        updated = cur.rowcount
+    cur.execute(f"""
+        INSERT INTO {table} ({cols})
+        SELECT {cols}
+        FROM ({staged}) s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM {table} t WHERE t.{key} = s.{key}
+        )
+    """)
+    return cur.rowcount, updated
+
+
+def upsert_frame(conn, table, df, key):
+    """
+    Set-based refresh of a reference table keyed by `key`.
+
+    df is COPYed into a temp table and merged with one
+    INSERT ... ON CONFLICT DO UPDATE. Rows whose values did not change are
+    left untouched. Returns {"inserted", "updated", "unchanged"} counts.
+    The caller owns the transaction.
+    """
+    columns = list(df.columns)
+    cols = ", ".join(columns)
+    values = [c for c in columns if c != key]
+    tmp = f"{table.split('.')[-1]}_upsert"
+
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {tmp}")
+        cur.execute(
+            f"CREATE TEMP TABLE {tmp} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP"
+        )
+
+    copy_frame(conn, df, tmp, columns, commit=False)
+
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            WITH src AS ({distinct_rows_sql(tmp, columns, key)}),
+            merged AS (
+                INSERT INTO {table} AS t ({cols})
+                SELECT {cols} FROM src
+                ON CONFLICT ({key}) DO UPDATE
+                SET {", ".join(f"{c} = EXCLUDED.{c}" for c in values)}
+                WHERE ({", ".join(f"t.{c}" for c in values)})
+                    IS DISTINCT FROM ({", ".join(f"EXCLUDED.{c}" for c in values)})
+                RETURNING (xmax = 0) AS inserted
+            )
+            SELECT
+                (SELECT COUNT(*) FROM src),
+                COUNT(*) FILTER (WHERE inserted),
+                COUNT(*) FILTER (WHERE NOT inserted)
+            FROM merged
+        """)
+        total, inserted, updated = cur.fetchone()
+
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": total - inserted - updated,
+    }
+
+
+def bulk_load(frames, workers=DEFAULT_WORKERS):
+    """
+    Load several DataFrames through COPY -> unlogged staging -> merge.
+
+    frames is an ordered list of (table, df, key) tuples; merges run in that
+    order inside a single transaction, so parent tables (providers) should
+    come before child tables (claims).
+    """
+    return bulk_load_batches([frames], workers)
+
+
+def bulk_load_batches(batches, workers=DEFAULT_WORKERS, update=()):
+    # Same as bulk_load, but `batches` is an iterable of frame lists (e.g. one
+    # per CSV chunk). Every batch is COPYed into staging as it arrives and the
+    # merge runs once at the end, so only one batch is in memory at a time.
+    # Tables named in `update` are upserted instead of insert-only.
+    conn = get_connection()
+    tables = {}
+    try:
+        for frames in batches:
+            for table, df, key in frames:
+                if table not in tables:
+                    with conn.cursor() as cur:
+                        create_staging_table(cur, table)
+                    conn.commit()
+                    tables[table] = {
+                        "columns": list(df.columns),
+                        "key": key,
+                        "rows": 0,
+                        "seconds": 0.0,
+                        "workers": {},
+                    }
+
+                t = tables[table]
+                start = time.perf_counter()
+                for s in parallel_copy(df, staging_name(table), t["columns"], workers):
+                    rows, seconds = t["workers"].get(s["worker"], (0, 0.0))
+                    t["workers"][s["worker"]] = (rows + s["rows"], seconds + s["seconds"])
+                t["rows"] += len(df)
+                t["seconds"] += time.perf_counter() - start
+
+        for table, t in tables.items():
+            print(
+                f"Staged {t['rows']} rows into {staging_name(table)} "
+                f"in {t['seconds']:.2f}s ({t['rows'] / t['seconds'] if t['seconds'] else 0:,.0f} rows/sec)"
+            )
+            print_worker_stats(table, t["workers"])
+
+        merged = {}
+        with conn.cursor() as cur:
+            for table, t in tables.items():
+                inserted, updated = merge_staging(
+                    cur, table, t["columns"], t["key"], update=table in update
+                )
+                merged[table] = inserted
+                print(f"Merged {inserted} new and {updated} changed rows into {table}")
+            for table in tables:
+                drop_staging_table(cur, table)
+        conn.commit()
+        return merged
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
@@ -1,9 +1,10 @@
+import argparse
 import os
 import pandas as pd
-import plotly.express as px
 from sqlalchemy import create_engine
-import matplotlib.pyplot as plt
 from dotenv import load_dotenv
+from dashboard.binning import histogram
+from dashboard.rendering import FORMATS, Chart, render_many
 
 # 1. Load variables from .env
 load_dotenv()
@@ -11,66 +12,61 @@ load_dotenv()
 # 2. Assign the environment variables to names the script can use
 # Note: I used DB_PASSWORD to match your psycopg2 block above
 DB_USER = os.getenv("DB_USER")
-DB_PASS = os.getenv("DB_PASSWORD") 
+DB_PASS = os.getenv("DB_PASSWORD")
 DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "5432")
 DB_NAME = os.getenv("DB_NAME")
 
-# 3. Create engine using the variables defined above
-# Added the port to ensure it connects to the right instance
-engine = create_engine(f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
 
-# 4. Fetch and Plot
-try:
+def build_charts(engine, fmt="png"):
     # 1. Risk Tier Distribution
-    risk_df = pd.read_sql("SELECT risk_tier, COUNT(*) AS count FROM provider_risk_tier GROUP BY risk_tier", engine)
+    risk_df = pd.read_sql("SELECT risk_tier, COUNT(*) AS count FROM provider_profile GROUP BY risk_tier", engine)
 
-    colors = plt.cm.viridis(range(len(risk_df)))
+    # 2./3. Peer Claims Z-Score and Temporal Spike Distributions (binned in Postgres)
+    raw_conn = engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cur:
+            peer_bins = histogram(cur, "peer_z", bins=30)
+            spike_bins = histogram(cur, "spike", bins=30)
+    finally:
+        raw_conn.close()
 
-    plt.figure(figsize=(10, 6))
-    plt.bar(risk_df["risk_tier"], risk_df["count"], color=plt.cm.Paired(range(len(risk_df))))
-    plt.title("Provider Risk Tier Distribution")
-    plt.xlabel("Risk Tier")
-    plt.ylabel("Number of Providers")
-    plt.tight_layout()
-    plt.show(block=False)
-
-    # 2. Peer Claims Z-Score Distribution
-    peer_df = pd.read_sql("SELECT claims_peer_z FROM provider_peer_risk", engine)
-
-    plt.figure(figsize=(10, 6))
-    plt.hist(peer_df["claims_peer_z"].dropna(), bins=30, color='royalblue', edgecolor='white')
-    plt.title("Distribution of Peer Claims Z-Scores")
-    plt.xlabel("Claims Peer Z-Score")
-    plt.ylabel("Frequency")
-    plt.tight_layout()
-    plt.show(block=False)
-
-    # 3. Temporal Spike Distribution
-    spike_df = pd.read_sql("SELECT max_spike_risk FROM provider_spike_risk_score", engine)
+    # 4. Average Claim Amount by Specialty
+    spec_df = pd.read_sql("SELECT specialty, AVG(avg_claim_amount) as avg_amount FROM provider_profile GROUP BY specialty", engine)
 
-    plt.figure(figsize=(10, 6))
-    plt.hist(spike_df["max_spike_risk"].dropna(), bins=30, color='royalblue', edgecolor='white')
-    plt.title("Distribution of Maximum Temporal Spike Z-Scores")
-    plt.xlabel("Max Spike Z-Score")
-    plt.ylabel("Frequency")
-    plt.tight_layout()
-    plt.show(block=False)
+    return {
+        "risk_tiers": Chart("risk_tiers", risk_df, {"title": "Provider Risk Tier Distribution", "figsize": [10, 6]}, fmt),
+        "peer_z": Chart("histogram", peer_bins, {
+            "title": "Distribution of Peer Claims Z-Scores",
+            "xlabel": "Claims Peer Z-Score",
+            "color": "royalblue",
+            "figsize": [10, 6],
+        }, fmt),
+        "spike": Chart("histogram", spike_bins, {
+            "title": "Distribution of Maximum Temporal Spike Z-Scores",
+            "xlabel": "Max Spike Z-Score",
+            "color": "royalblue",
+            "figsize": [10, 6],
+        }, fmt),
+        "specialty_avg": Chart("specialty_avg", spec_df, {"figsize": [10, 6]}, fmt),
+    }
 
-    # 4. Average Claim Amount by Specialty
-    spec_df = pd.read_sql("SELECT specialty, AVG(avg_claim_amount) as avg_amount From provider_summary GROUP BY specialty", engine)
 
-    colors = plt.cm.viridis(range(len(spec_df)))
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the summary charts (cached by data)")
+    parser.add_argument("--format", choices=FORMATS, default="png")
+    args = parser.parse_args()
 
-    plt.figure(figsize=(10, 6))
-    plt.bar(spec_df["specialty"], spec_df["avg_amount"], color=plt.cm.Paired(range(len(spec_df))))
-    plt.xticks(rotation=45, ha='right')
-    plt.title("Average Claim Amount by Specialty")
-    plt.xlabel("Specialty")
-    plt.ylabel("Average Claim Amount")
-    plt.tight_layout()
-    plt.show()
+    # 3. Create engine using the variables defined above
+    # Added the port to ensure it connects to the right instance
+    engine = create_engine(f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
 
-    # engine.close()
-except Exception as e:
-    print(f"Error occurred: {e}")
+    # 4. Fetch and render; charts whose data has not changed come from the cache
+    try:
+        charts = build_charts(engine, args.format)
+        for name, path in zip(charts, render_many(list(charts.values()))):
+            print(f"{name}: {path}")
+    except Exception as e:
+        print(f"Error occurred: {e}")
+    finally:
+        engine.dispose()
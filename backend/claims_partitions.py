@@ -0,0 +1,373 @@
+import argparse
+from datetime import date
+
+from bulk_load import get_connection
+from scoring_pipeline import apply_schema as apply_scoring_schema
+
+# claims is range-partitioned by service_date, one partition per month
+# (claims_y2024m01, ...), plus claims_default for dates outside every
+# attached month. Loaders attach the months of a batch before loading it
+# (ensure_partitions(conn, months=...)), so claims_default should stay
+# empty; rows that land there anyway are moved out when their month is
+# attached.
+MONTHS_AHEAD = 3
+
+PARENT_INDEXES = """
+CREATE INDEX IF NOT EXISTS claims_claim_id_idx ON claims (claim_id);
+CREATE INDEX IF NOT EXISTS claims_provider_date_idx ON claims (provider_id, service_date);
+CREATE INDEX IF NOT EXISTS claims_cpt_provider_idx ON claims (cpt_code, provider_id);
+"""
+
+
+# ---- MONTH HELPERS ----
+def month_start(d):
+    return date(d.year, d.month, 1)
+
+
+def add_months(d, n):
+    y, m = divmod(d.month - 1 + n, 12)
+    return date(d.year + y, m + 1, 1)
+
+
+def month_range(first, last):
+    m = month_start(first)
+    while m <= last:
+        yield m
+        m = add_months(m, 1)
+
+
+def partition_name(month):
+    return f"claims_y{month.year}m{month.month:02d}"
+
+
+def is_partitioned(cur):
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = 'claims'::regclass")
+    return cur.fetchone()[0] == "p"
+
+
+def existing_partitions(cur):
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'claims'::regclass
+    """)
+    return {r[0] for r in cur.fetchall()}
+
+
+# ---- PARTITION MAINTENANCE ----
+def take_default_rows(cur, month, into=None):
+    # Removes claims_default's rows for `month`, inserting them into table
+    # `into` when given: the default partition may not hold rows for a month
+    # that gets its own partition, or the ATTACH fails. Returns the count.
+    if "claims_default" not in existing_partitions(cur):
+        return 0
+    lo, hi = month, add_months(month, 1)
+    delete = "DELETE FROM claims_default WHERE service_date >= %s AND service_date < %s"
+    if into is None:
+        cur.execute(delete, (lo, hi))
+    else:
+        cur.execute(
+            f"WITH moved AS ({delete} RETURNING *) INSERT INTO {into} SELECT * FROM moved",
+            (lo, hi),
+        )
+    return cur.rowcount
+
+
+def attach_month(cur, month):
+    # Build the partition as a plain table and ATTACH it. The matching CHECK
+    # constraint lets ATTACH skip its validation scan, and ATTACH only takes
+    # SHARE UPDATE EXCLUSIVE on claims, so reads and inserts keep flowing.
+    # Rows claims_default holds for the month are moved in first; ATTACH
+    # then scans claims_default under an ACCESS EXCLUSIVE lock on it alone.
+    name = partition_name(month)
+    lo, hi = month, add_months(month, 1)
+    cur.execute(f"CREATE TABLE {name} (LIKE claims INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cur.execute(
+        f"ALTER TABLE {name} ADD CONSTRAINT {name}_bounds "
+        "CHECK (service_date IS NOT NULL AND service_date >= %s AND service_date < %s)",
+        (lo, hi),
+    )
+    moved = take_default_rows(cur, month, into=name)
+    if moved:
+        print(f"Moved {moved} claims from claims_default into {name}")
+    cur.execute(
+        f"ALTER TABLE claims ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+        (lo, hi),
+    )
+    cur.execute(f"ALTER TABLE {name} DROP CONSTRAINT {name}_bounds")
+    return name
+
+
+def ensure_partitions(conn, first=None, months_ahead=MONTHS_AHEAD, months=()):
+    """
+    Create every missing monthly partition from `first` (default: this
+    month) through `months_ahead` months from now, plus the month of each
+    date in `months`. Loaders pass the service dates of a batch before
+    loading it, so no row is routed to claims_default.
+
+    Does nothing while claims is still a plain table (before `migrate`).
+    """
+    today = date.today()
+    last = add_months(month_start(today), months_ahead)
+    wanted = set(month_range(first or today, last)) | {month_start(d) for d in months}
+    created = []
+    with conn.cursor() as cur:
+        if not is_partitioned(cur):
+            return created
+        have = existing_partitions(cur)
+        for month in sorted(wanted):
+            if partition_name(month) not in have:
+                created.append(attach_month(cur, month))
+        if "claims_default" not in have:
+            cur.execute("CREATE TABLE claims_default PARTITION OF claims DEFAULT")
+            created.append("claims_default")
+    conn.commit()
+    for name in created:
+        print(f"Attached partition {name}")
+    return created
+
+
+def create_swap_table(conn, month):
+    # Empty table shaped like claims for a month's replacement rows; load
+    # it (COPY, copy_frame, ...) and hand it to swap_partition
+    name = f"{partition_name(month)}_incoming"
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {name}")
+        cur.execute(f"CREATE TABLE {name} (LIKE claims INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    conn.commit()
+    return name
+
+
+def swap_partition(conn, month, source_table, keep_old=False):
+    """
+    Replace one month of claims with the rows already loaded in
+    source_table (from create_swap_table), e.g. a re-delivered CMS month.
+
+    The new table is validated against the month bounds before the
+    detach/attach, so the swap itself is a short metadata-only transaction.
+    ATTACH does not fire insert triggers and a swap can remove claims, so
+    run `scoring_pipeline.py --full` afterwards.
+    """
+    name = partition_name(month)
+    lo, hi = month, add_months(month, 1)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"ALTER TABLE {source_table} ADD CONSTRAINT {source_table}_bounds "
+                "CHECK (service_date IS NOT NULL AND service_date >= %s AND service_date < %s)",
+                (lo, hi),
+            )
+            if name in existing_partitions(cur):
+                cur.execute(f"ALTER TABLE claims DETACH PARTITION {name}")
+                if keep_old:
+                    cur.execute(f"ALTER TABLE {name} RENAME TO {name}_replaced")
+                else:
+                    cur.execute(f"DROP TABLE {name}")
+            else:
+                # The month had no partition: its old rows are in claims_default
+                if keep_old:
+                    cur.execute(f"CREATE TABLE {name}_replaced (LIKE claims INCLUDING DEFAULTS)")
+                take_default_rows(cur, month, into=f"{name}_replaced" if keep_old else None)
+            cur.execute(f"ALTER TABLE {source_table} RENAME TO {name}")
+            cur.execute(
+                f"ALTER TABLE claims ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+                (lo, hi),
+            )
+            cur.execute(f"ALTER TABLE {name} DROP CONSTRAINT {source_table}_bounds")
+            cur.execute(
+                "INSERT INTO scoring_pending_months (month) VALUES (%s) ON CONFLICT DO NOTHING",
+                (lo,),
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    print(f"Swapped in {name}; run scoring_pipeline.py --full to rescore")
+
+
+def detach_month(conn, month, drop=False):
+    # Takes a month out of claims (e.g. to archive it) without deleting rows
+    name = partition_name(month)
+    with conn.cursor() as cur:
+        cur.execute(f"ALTER TABLE claims DETACH PARTITION {name}")
+        if drop:
+            cur.execute(f"DROP TABLE {name}")
+    conn.commit()
+    print(f"Detached {name}")
+
+
+# ---- ONE-TIME MIGRATION ----
+def dependent_views(cur):
+    # Views built on claims (directly or through other views), parents first
+    cur.execute("""
+        WITH RECURSIVE deps AS (
+            SELECT v.oid, 1 AS depth
+            FROM pg_depend d
+            JOIN pg_rewrite r ON r.oid = d.objid
+            JOIN pg_class v ON v.oid = r.ev_class
+            WHERE d.refobjid = 'claims'::regclass
+              AND v.relkind = 'v'
+            UNION
+            SELECT v.oid, deps.depth + 1
+            FROM deps
+            JOIN pg_depend d ON d.refobjid = deps.oid
+            JOIN pg_rewrite r ON r.oid = d.objid
+            JOIN pg_class v ON v.oid = r.ev_class
+            WHERE v.relkind = 'v'
+              AND v.oid <> deps.oid
+        )
+        SELECT c.relname, pg_get_viewdef(c.oid)
+        FROM deps
+        JOIN pg_class c ON c.oid = deps.oid
+        GROUP BY c.oid, c.relname
+        ORDER BY MAX(deps.depth), c.relname
+    """)
+    return cur.fetchall()
+
+
+def table_constraints(cur, table):
+    # (name, type, definition, columns) of the PK / UNIQUE / FK constraints
+    cur.execute(
+        """
+        SELECT
+            con.conname,
+            con.contype,
+            pg_get_constraintdef(con.oid),
+            ARRAY(
+                SELECT a.attname::text
+                FROM unnest(con.conkey) WITH ORDINALITY AS k(attnum, ord)
+                JOIN pg_attribute a
+                  ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+                ORDER BY k.ord
+            )
+        FROM pg_constraint con
+        WHERE con.conrelid = %s::regclass
+          AND con.contype IN ('p', 'u', 'f')
+        ORDER BY con.contype DESC, con.conname
+        """,
+        (table,),
+    )
+    return cur.fetchall()
+
+
+def partitioned_constraint(contype, definition, columns):
+    # A PK / UNIQUE constraint on a partitioned table must contain the
+    # partition key, so service_date is appended: (claim_id) becomes
+    # (claim_id, service_date). Foreign keys carry over as they are.
+    if contype == "f":
+        return definition
+    kind = "PRIMARY KEY" if contype == "p" else "UNIQUE"
+    if "service_date" not in columns:
+        columns = columns + ["service_date"]
+    return f"{kind} ({', '.join(columns)})"
+
+
+def migrate_to_partitioned(conn, months_ahead=MONTHS_AHEAD):
+    """
+    Convert a plain claims table into the monthly-partitioned layout in one
+    transaction: the view chain on top of claims is dropped and recreated
+    from its own definitions, rows are copied into the partitions, the
+    table's PK / UNIQUE / FK constraints are recreated on the new parent
+    (keys widened with service_date) and the scoring trigger is reinstalled.
+
+    A widened primary key makes service_date NOT NULL, so claims without a
+    service date must be fixed (or the key dropped) before migrating.
+    """
+    try:
+        with conn.cursor() as cur:
+            if is_partitioned(cur):
+                print("claims is already partitioned")
+                return
+
+            cur.execute("""
+                SELECT conrelid::regclass::text
+                FROM pg_constraint
+                WHERE confrelid = 'claims'::regclass AND contype = 'f'
+            """)
+            referencing = [r[0] for r in cur.fetchall()]
+            if referencing:
+                # claim_id alone is no longer unique, so nothing can reference it
+                raise RuntimeError(
+                    f"Foreign keys from {', '.join(referencing)} reference claims; "
+                    "drop them before migrating"
+                )
+
+            constraints = table_constraints(cur, "claims")
+            if any(contype == "p" for _, contype, _, _ in constraints):
+                cur.execute("SELECT COUNT(*) FROM claims WHERE service_date IS NULL")
+                undated = cur.fetchone()[0]
+                if undated:
+                    raise RuntimeError(
+                        f"{undated} claims have no service_date; the primary key "
+                        "becomes (..., service_date), so fix them before migrating"
+                    )
+
+            views = dependent_views(cur)
+            for name, _ in reversed(views):
+                cur.execute(f"DROP VIEW IF EXISTS {name}")
+
+            cur.execute("ALTER TABLE claims RENAME TO claims_unpartitioned")
+            cur.execute("""
+                CREATE TABLE claims (
+                    LIKE claims_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS
+                ) PARTITION BY RANGE (service_date)
+            """)
+
+            cur.execute("SELECT MIN(service_date), MAX(service_date) FROM claims_unpartitioned")
+            first, last = cur.fetchone()
+            today = date.today()
+            first = month_start(first or today)
+            last = max(month_start(last or today), add_months(month_start(today), months_ahead))
+            for month in month_range(first, last):
+                cur.execute(
+                    f"CREATE TABLE {partition_name(month)} PARTITION OF claims "
+                    "FOR VALUES FROM (%s) TO (%s)",
+                    (month, add_months(month, 1)),
+                )
+            cur.execute("CREATE TABLE claims_default PARTITION OF claims DEFAULT")
+
+            cur.execute("INSERT INTO claims SELECT * FROM claims_unpartitioned")
+            print(f"Copied {cur.rowcount} claims into {len(list(month_range(first, last)))} monthly partitions")
+            cur.execute("DROP TABLE claims_unpartitioned")
+
+            # Added after the copy (one index build instead of per-row
+            # maintenance) and after the drop, which frees the names
+            for name, contype, definition, columns in constraints:
+                constraint = partitioned_constraint(contype, definition, columns)
+                cur.execute(f"ALTER TABLE claims ADD CONSTRAINT {name} {constraint}")
+                print(f"Recreated constraint {name}: {constraint}")
+
+            cur.execute(PARENT_INDEXES)
+            for name, definition in views:
+                cur.execute(f"CREATE VIEW {name} AS {definition}")
+            apply_scoring_schema(cur)
+        conn.commit()
+        print(f"Recreated {len(views)} dependent views")
+    except Exception:
+        conn.rollback()
+        raise
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monthly partitions for the claims table")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("migrate", help="convert claims to a partitioned table")
+    maintain = sub.add_parser("maintain", help="create and attach upcoming partitions")
+    maintain.add_argument("--months-ahead", type=int, default=MONTHS_AHEAD)
+    detach = sub.add_parser("detach", help="detach one month (YYYY-MM)")
+    detach.add_argument("month")
+    detach.add_argument("--drop", action="store_true")
+    args = parser.parse_args()
+
+    conn = get_connection()
+    try:
+        if args.command == "migrate":
+            migrate_to_partitioned(conn)
+        elif args.command == "maintain":
+            ensure_partitions(conn, months_ahead=args.months_ahead)
+        elif args.command == "detach":
+            year, month = map(int, args.month.split("-"))
+            detach_month(conn, date(year, month, 1), drop=args.drop)
+    finally:
+        conn.close()
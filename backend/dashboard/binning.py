@@ -0,0 +1,83 @@
+import pandas as pd
+
+# Server-side binning for the dashboard histograms (app.py, charts.py,
+# management_pack.py).
+# Postgres bins the values with width_bucket and only the bin counts come
+# back, so a panel costs the same for a thousand providers or a million.
+# No Streamlit dependency, so plain scripts can use it too.
+
+# Distributions that can be binned: name -> (table, column, predicate that
+# restricts a row to %(specialty)s)
+DISTRIBUTIONS = {
+    "peer_z": ("provider_peer_risk_mat", "claims_peer_z", "specialty = %(specialty)s"),
+    "spike": (
+        "provider_spike_risk_mat",
+        "max_spike_risk",
+        "provider_id IN ("
+        "SELECT provider_id FROM provider_claim_totals WHERE specialty = %(specialty)s)",
+    ),
+}
+
+HISTOGRAM_SQL = """
+    WITH v AS (
+        SELECT {column}::float8 AS x
+        FROM {table}
+        WHERE {column} IS NOT NULL
+          AND (%(specialty)s::text IS NULL OR {specialty_filter})
+    ),
+    bounds AS (
+        SELECT
+            COALESCE(%(lo)s::float8, MIN(x)) AS lo,
+            COALESCE(%(hi)s::float8, MAX(x)) AS hi
+        FROM v
+    ),
+    r AS (
+        -- A single distinct value gets a unit-wide range, as in matplotlib
+        SELECT
+            CASE WHEN hi > lo THEN lo ELSE lo - 0.5 END AS lo,
+            CASE WHEN hi > lo THEN hi ELSE hi + 0.5 END AS hi
+        FROM bounds
+        WHERE lo IS NOT NULL AND hi IS NOT NULL
+    ),
+    counts AS (
+        -- The upper edge belongs to the last bin
+        SELECT
+            LEAST(width_bucket(v.x, r.lo, r.hi, %(bins)s), %(bins)s) AS bucket,
+            COUNT(*) AS count
+        FROM v, r
+        WHERE v.x BETWEEN r.lo AND r.hi
+        GROUP BY 1
+    )
+    SELECT
+        r.lo + (b - 1) * (r.hi - r.lo) / %(bins)s AS bin_start,
+        r.lo + b * (r.hi - r.lo) / %(bins)s AS bin_end,
+        COALESCE(c.count, 0) AS count
+    FROM r
+    CROSS JOIN generate_series(1, %(bins)s) AS b
+    LEFT JOIN counts c ON c.bucket = b
+    ORDER BY b
+"""
+
+
+def histogram(cur, distribution, bins=30, lo=None, hi=None, specialty=None):
+    """
+    Bin counts for one of DISTRIBUTIONS: a frame of bin_start, bin_end,
+    count with `bins` equal-width bins over [lo, hi] (default: the data's
+    min and max). Values outside an explicit range are left out, as with
+    matplotlib's hist(range=...). `specialty` limits it to one specialty's
+    providers.
+    """
+    if lo is not None and hi is not None and lo > hi:
+        raise ValueError("histogram range: lo must not exceed hi")
+    table, column, specialty_filter = DISTRIBUTIONS[distribution]
+    cur.execute(
+        HISTOGRAM_SQL.format(table=table, column=column, specialty_filter=specialty_filter),
+        {"bins": int(bins), "lo": lo, "hi": hi, "specialty": specialty},
+    )
+    columns = [d[0] for d in cur.description]
+    return pd.DataFrame.from_records(cur.fetchall(), columns=columns, coerce_float=True)
+
+
+def bin_edges(bins_df):
+    # bins= argument for matplotlib's hist(bin_start, bins=..., weights=count)
+    return bins_df["bin_start"].tolist() + bins_df["bin_end"].tail(1).tolist()
@@ -0,0 +1,276 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+import psycopg2
+import streamlit as st
+from dotenv import load_dotenv
+from psycopg2.pool import ThreadedConnectionPool
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from dashboard.binning import histogram
+from provider_search import search_sql
+
+# Data access for the Streamlit dashboards (app.py and dashboard/app.py).
+#
+# Every loader is an st.cache_data function keyed on its parameters plus the
+# latest scoring run id, so reruns (every widget interaction) are served from
+# the cache until a new scoring run lands or the TTL expires. Queries use
+# bound parameters and borrow a connection from a process-wide pool for the
+# duration of one query.
+
+load_dotenv()
+
+CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "600"))
+# How long the latest scoring run id is trusted before re-checking
+VERSION_TTL = int(os.getenv("DASHBOARD_VERSION_TTL", "30"))
+POOL_MAX = int(os.getenv("DASHBOARD_POOL_MAX", "8"))
+# Matches shown by the provider typeahead
+SEARCH_LIMIT = 50
+
+
+class BlockingConnectionPool(ThreadedConnectionPool):
+    # ThreadedConnectionPool raises PoolError when exhausted; wait instead
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+
+    def getconn(self, key=None):
+        self._slots.acquire()
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._slots.release()
+
+
+@st.cache_resource
+def get_pool():
+    # One pool per Streamlit server process, shared by all sessions
+    return BlockingConnectionPool(
+        1,
+        POOL_MAX,
+        dbname=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST", "localhost"),
+        port=os.getenv("DB_PORT", "5432"),
+    )
+
+
+@contextmanager
+def connection():
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        if not conn.closed:
+            conn.rollback()  # end the read transaction before reuse
+        pool.putconn(conn, close=bool(conn.closed))
+
+
+def query(sql, params=None):
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, params)
+        columns = [d[0] for d in cur.description]
+        return pd.DataFrame.from_records(cur.fetchall(), columns=columns, coerce_float=True)
+
+
+def load_concurrently(loaders):
+    """
+    Run independent loaders in parallel threads.
+
+    loaders maps a name to (function, args); returns name -> result. The
+    Streamlit script context is attached to each thread so st.cache_data
+    behaves as it does on the script thread.
+    """
+    ctx = get_script_run_ctx()
+
+    def run(fn, args):
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(len(loaders), POOL_MAX))) as executor:
+        futures = {name: executor.submit(run, fn, args) for name, (fn, args) in loaders.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+# ---- SCORING RUN VERSION ----
+@st.cache_data(ttl=VERSION_TTL, show_spinner=False)
+def scoring_version():
+    try:
+        df = query("SELECT MAX(run_id) AS run_id FROM scoring_runs WHERE status = 'complete'")
+    except psycopg2.errors.UndefinedTable:
+        return None
+    run_id = df["run_id"].iloc[0]
+    return int(run_id) if pd.notnull(run_id) else None
+
+
+# ---- LOADERS ----
+# `version` is the scoring run id: it is only there to key the cache, so a
+# new scoring run misses every entry cached for the previous one. Provider
+# figures and tiers are read from provider_profile, which the scoring run
+# rebuilds, never from the live views over claims.
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def risk_summary(version):
+    return query("""
+        SELECT risk_tier, COUNT(*) as count
+        FROM provider_profile
+        GROUP BY risk_tier
+    """)
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def distribution(version, name, bins=30, lo=None, hi=None):
+    with connection() as conn, conn.cursor() as cur:
+        return histogram(cur, name, bins, lo, hi)
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def specialty_avg_amount(version):
+    return query("""
+        SELECT specialty, AVG(avg_claim_amount) as avg_amount
+        FROM provider_profile
+        GROUP BY specialty
+    """)
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def specialties(version):
+    return query("""
+        SELECT DISTINCT specialty
+        FROM provider_profile
+        ORDER BY specialty
+    """)["specialty"].tolist()
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def search_providers(version, q, limit=SEARCH_LIMIT):
+    # Same statements as GET /providers/search (provider_search.py)
+    search = search_sql(q, limit)
+    if search is None:
+        return pd.DataFrame(columns=["provider_id", "specialty", "matched_on"])
+    return query(*search)
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def top_risk_providers(version, limit=10):
+    return query("""
+        SELECT
+            provider_id,
+            specialty,
+            claims_peer_z
+        FROM provider_profile
+        WHERE risk_tier = 'High'
+        ORDER BY claims_peer_z DESC
+        LIMIT %(limit)s
+    """, {"limit": limit})
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def provider_profile(version, provider_id):
+    # One primary key lookup on the table rebuilt by each scoring run;
+    # top_explanations comes back as a list of dicts (JSONB)
+    return query("""
+        SELECT
+            provider_id,
+            specialty,
+            risk_tier,
+            claims_peer_z,
+            max_spike_risk,
+            avg_claim_amount,
+            total_claims,
+            top_explanations
+        FROM provider_profile
+        WHERE provider_id = %(provider_id)s
+    """, {"provider_id": provider_id})
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def providers_by_specialty(version, specialty=None):
+    sql = """
+        SELECT provider_id, risk_tier, claims_peer_z, specialty
+        FROM provider_profile
+    """
+    if specialty is not None:
+        sql += " WHERE specialty = %(specialty)s"
+    return query(sql, {"specialty": specialty})
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def high_risk_providers(version, provider_id=None):
+    sql = """
+        SELECT provider_id, specialty, claims_peer_z, risk_tier
+        FROM provider_profile
+        WHERE risk_tier = 'High'
+    """
+    if provider_id is not None:
+        sql += " AND provider_id = %(provider_id)s"
+    sql += " ORDER BY claims_peer_z DESC"
+    return query(sql, {"provider_id": provider_id})
+
+
+# ---- BETOS DASHBOARD (dashboard/app.py) ----
+# The BETOS tables are loaded by ingest_betos.py rather than the scoring run,
+# so for them the version key mostly adds a refresh point; the TTL bounds
+# how stale they can be.
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def betos_complexity(version):
+    return query("""
+        SELECT betos_group, complexity_score
+        FROM betos_complexity
+        ORDER BY complexity_score DESC
+    """)
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def betos_cost_volume(version, top_n, sample):
+    # The top_n groups by cost per service, plus every k-th of the rest by
+    # cost rank, k chosen so at most `sample` of them are kept
+    return query("""
+        WITH ranked AS (
+            SELECT betos_group,
+            allowed_services,
+            payment_amt,
+            (payment_amt / NULLIF(allowed_services, 0)) AS avg_cost_per_service,
+            ROW_NUMBER() OVER (
+                ORDER BY payment_amt / NULLIF(allowed_services, 0) DESC NULLS LAST
+            ) AS cost_rank,
+            COUNT(*) OVER () AS n
+            FROM betos_metrics
+        )
+        SELECT betos_group,
+        allowed_services,
+        payment_amt,
+        avg_cost_per_service
+        FROM ranked
+        WHERE cost_rank <= %(top_n)s
+           OR (cost_rank - %(top_n)s) %% GREATEST(CEIL((n - %(top_n)s)::numeric / %(sample)s)::int, 1) = 0
+        ORDER BY avg_cost_per_service DESC
+    """, {"top_n": top_n, "sample": sample})
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def top_avg_claim_providers(version, limit=20):
+    # provider_profile (one row per provider, rebuilt by each scoring run)
+    # instead of grouping all of claims; reads provider_profile_avg_amount_idx
+    return query("""
+        SELECT
+            provider_id,
+            specialty,
+            total_claims,
+            avg_claim_amount AS avg_claim
+        FROM provider_profile
+        ORDER BY avg_claim_amount DESC NULLS LAST
+        LIMIT %(limit)s
+    """, {"limit": limit})
@@ -0,0 +1,263 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import matplotlib.style
+import pandas as pd
+import seaborn as sns
+from matplotlib.figure import Figure
+
+from dashboard.binning import bin_edges
+
+# Headless chart rendering for the dashboards (app.py, dashboard/app.py),
+# charts.py and the management pack (management_pack.py).
+#
+# A Chart is a plot kind, the frame it plots and its options. Rendered images
+# are stored on disk under a hash of all three, so a chart is drawn once per
+# distinct data: after a new scoring run the data changes and the chart is
+# re-rendered, otherwise the cached file is served. Figures are drawn with
+# matplotlib.figure.Figure (Agg canvas, no pyplot state), in-process or
+# across a process pool. No Streamlit dependency.
+
+CACHE_DIR = os.getenv("CHART_CACHE_DIR", os.path.join(tempfile.gettempdir(), "fraud-charts"))
+RENDER_WORKERS = int(os.getenv("CHART_RENDER_WORKERS", str(os.cpu_count() or 1)))
+# Cached images not served for this long are removed by prune_cache()
+CACHE_MAX_AGE_DAYS = float(os.getenv("CHART_CACHE_MAX_AGE_DAYS", "14"))
+
+FORMATS = ("png", "svg")
+STYLE = "seaborn-v0_8-darkgrid"
+DPI = 100
+# Part of every cache key; bump it when a plot function's output changes
+RENDER_VERSION = 1
+
+TIER_ORDER = ["High", "Medium", "Low"]
+TIER_COLORS = {"High": "#d62728", "Medium": "#ff7f0e", "Low": "#2ca02c"}
+
+
+@dataclass(frozen=True)
+class Chart:
+    kind: str  # a key of PLOTS
+    data: pd.DataFrame
+    # JSON-serializable: title, axis labels, colors, figsize, ...
+    options: dict = field(default_factory=dict)
+    fmt: str = "png"
+
+
+# ---- PLOTS ----
+# Each draws chart.data onto one Axes. Options not given fall back to the
+# dashboard's look.
+def _finish(ax, options, title, xlabel=None, ylabel=None):
+    ax.set_title(options.get("title", title), fontweight="bold")
+    if options.get("xlabel", xlabel):
+        ax.set_xlabel(options.get("xlabel", xlabel))
+    if options.get("ylabel", ylabel):
+        ax.set_ylabel(options.get("ylabel", ylabel))
+    ax.spines["top"].set_visible(False)
+    ax.spines["right"].set_visible(False)
+
+
+def plot_risk_tiers(ax, df, options):
+    # df: risk_tier, count
+    df = df.set_index("risk_tier").reindex(TIER_ORDER).dropna().reset_index()
+    bars = ax.bar(df["risk_tier"], df["count"], color=[TIER_COLORS[t] for t in df["risk_tier"]])
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(
+            bar.get_x() + bar.get_width() / 2,
+            height,
+            f"{int(height)}",
+            ha="center",
+            va="bottom",
+            fontweight="bold",
+        )
+    _finish(ax, options, "Risk Tier Distribution", "Risk Tier", "Number of Providers")
+
+
+def plot_histogram(ax, df, options):
+    # df: bin_start, bin_end, count (dashboard.binning.histogram)
+    ax.hist(
+        df["bin_start"],
+        bins=bin_edges(df),
+        weights=df["count"],
+        color=options.get("color", "#1f77b4"),
+        edgecolor="black",
+        alpha=0.75,
+    )
+    threshold = options.get("threshold")
+    if threshold is not None:
+        ax.axvline(threshold, color="red", linestyle="--", linewidth=2)
+        ax.text(threshold, ax.get_ylim()[1] * 0.9, f"Anomaly Threshold (Z={threshold})", color="red")
+    _finish(ax, options, "Distribution", ylabel="Frequency")
+
+
+def plot_specialty_avg(ax, df, options):
+    # df: specialty, avg_amount
+    df = df.sort_values("avg_amount", ascending=False)
+    ax.bar(df["specialty"], df["avg_amount"], color=options.get("color", "#17becf"))
+    ax.set_xticks(range(len(df)))
+    ax.set_xticklabels(df["specialty"], rotation=45, ha="right")
+    _finish(ax, options, "Average Claim Amount by Specialty", ylabel="Average Claim Amount")
+
+
+def plot_top_providers(ax, df, options):
+    # df: provider_id, claims_peer_z
+    df = df.sort_values("claims_peer_z", ascending=False).head(options.get("limit", 10))
+    bars = ax.barh(df["provider_id"].astype(str), df["claims_peer_z"], color=options.get("color", "#d62728"))
+    for bar in bars:
+        ax.text(
+            bar.get_width(),
+            bar.get_y() + bar.get_height() / 2,
+            f"{bar.get_width():.2f}",
+            va="center",
+            fontweight="bold",
+        )
+    _finish(ax, options, "Top 10 Riskiest Providers", "Peer Claims Z-Score", "Provider ID")
+
+
+def plot_risk_drivers(ax, df, options):
+    # df: driver, score
+    ax.barh(df["driver"], df["score"], color=options.get("color", "#ff7f0e"))
+    _finish(ax, options, "Provider Fraud Risk Drivers", "Risk Contribution")
+
+
+def plot_betos_complexity(ax, df, options):
+    # df: betos_group, complexity_score
+    sns.barplot(data=df, x="betos_group", y="complexity_score", ax=ax)
+    ax.tick_params(axis="x", labelrotation=90)
+    _finish(ax, options, "BETOS Complexity Scores", "BETOS Group", "Complexity Score")
+
+
+def plot_cost_volume(ax, df, options):
+    # df: allowed_services, avg_cost_per_service, payment_amt
+    sns.scatterplot(
+        data=df,
+        x="allowed_services",
+        y="avg_cost_per_service",
+        size="payment_amt",
+        sizes=(20, 50),
+        alpha=0.7,
+        ax=ax,
+    )
+    ax.set_xscale("log")
+    _finish(ax, options, "Cost vs Volume (Fraud Lens)", "Allowed Services (log scale)", "Avg Cost per Service")
+
+
+PLOTS = {
+    "risk_tiers": plot_risk_tiers,
+    "histogram": plot_histogram,
+    "specialty_avg": plot_specialty_avg,
+    "top_providers": plot_top_providers,
+    "risk_drivers": plot_risk_drivers,
+    "betos_complexity": plot_betos_complexity,
+    "cost_volume": plot_cost_volume,
+}
+
+
+# ---- CACHE ----
+def chart_key(chart):
+    """sha256 over the render version, kind, format, options and data."""
+    if chart.kind not in PLOTS:
+        raise ValueError(f"unknown chart kind: {chart.kind}")
+    if chart.fmt not in FORMATS:
+        raise ValueError(f"unsupported chart format: {chart.fmt}")
+    digest = hashlib.sha256()
+    digest.update(json.dumps(
+        [RENDER_VERSION, chart.kind, chart.fmt, chart.options],
+        sort_keys=True,
+        default=str,
+    ).encode())
+    digest.update(json.dumps(
+        [[str(c) for c in chart.data.columns], [str(t) for t in chart.data.dtypes]]
+    ).encode())
+    digest.update(pd.util.hash_pandas_object(chart.data, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def chart_path(chart, cache_dir=None):
+    key = chart_key(chart)
+    return os.path.join(cache_dir or CACHE_DIR, key[:2], f"{key}.{chart.fmt}")
+
+
+def _cached(path):
+    try:
+        # mtime doubles as last-served time for prune_cache()
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+# rcParams (the style context) are process-global
+_draw_lock = threading.Lock()
+
+
+def draw(chart, path):
+    """Render chart to path (write to a temp file, then rename)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with _draw_lock, matplotlib.style.context(chart.options.get("style", STYLE)):
+        fig = Figure(figsize=tuple(chart.options.get("figsize", (7, 4))))
+        ax = fig.subplots()
+        PLOTS[chart.kind](ax, chart.data, chart.options)
+        fig.tight_layout()
+        fig.savefig(tmp, format=chart.fmt, dpi=chart.options.get("dpi", DPI))
+    os.replace(tmp, path)
+    return path
+
+
+def render(chart, cache_dir=None):
+    """Path of the rendered chart, drawing it only on a cache miss."""
+    path = chart_path(chart, cache_dir)
+    if not _cached(path):
+        draw(chart, path)
+    return path
+
+
+def render_many(charts, cache_dir=None, workers=None):
+    """
+    Paths of the rendered charts, in order. Cache misses are drawn across a
+    process pool of up to `workers` (default CHART_RENDER_WORKERS) processes;
+    with one worker, or a single miss, they are drawn in-process.
+
+    The pool uses spawn, so a script calling this needs an
+    `if __name__ == "__main__":` guard.
+    """
+    paths = [chart_path(chart, cache_dir) for chart in charts]
+    missing = {}
+    for path, chart in zip(paths, charts):
+        if path not in missing and not _cached(path):
+            missing[path] = chart
+
+    workers = min(workers or RENDER_WORKERS, len(missing))
+    if workers <= 1:
+        for path, chart in missing.items():
+            draw(chart, path)
+    else:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            chunksize = max(1, len(missing) // (workers * 4))
+            list(pool.map(draw, missing.values(), missing.keys(), chunksize=chunksize))
+    return paths
+
+
+def prune_cache(cache_dir=None, max_age_days=None):
+    """Remove cached images not served within max_age_days; returns the count."""
+    cache_dir = cache_dir or CACHE_DIR
+    cutoff = time.time() - 86400 * (CACHE_MAX_AGE_DAYS if max_age_days is None else max_age_days)
+    removed = 0
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
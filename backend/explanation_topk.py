@@ -0,0 +1,4 @@
+# Explanation rows kept per provider in provider_explanation_topk. The
+# scoring run (scoring_pipeline.py) stores this many per provider, and the
+# API's per-provider explanation endpoints cap `limit` at it.
+EXPLANATION_TOP_K = 10
@@ -0,0 +1,71 @@
+import argparse
+import time
+
+import requests
+
+# Measures the streaming exports against a running API server:
+# time to first byte, total time, bytes, and the server process's resident
+# memory (VmRSS before, VmHWM high-water mark after) read from
+# /proc/<pid>/status, so it must run on the same Linux host as the server.
+#
+#   uvicorn app.main:app --port 8000 &
+#   python export_benchmark.py --pid $!
+#
+# Start a fresh server per measurement: VmHWM never goes down, so only the
+# first export's peak above the warm-up is attributable to it.
+
+ROUTES = ["provider-scores", "explanations"]
+FORMATS = ["ndjson", "csv", "arrow"]
+
+
+def memory_mb(pid, field):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1]) / 1024
+    raise ValueError(f"{field} not found for pid {pid}")
+
+
+def measure(url, pid, route, fmt):
+    rss_before = memory_mb(pid, "VmRSS") if pid else None
+    start = time.perf_counter()
+    first_byte = None
+    size = 0
+    with requests.get(f"{url}/export/{route}", params={"format": fmt}, stream=True, timeout=600) as resp:
+        resp.raise_for_status()
+        for chunk in resp.iter_content(chunk_size=64 * 1024):
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            size += len(chunk)
+    return {
+        "route": route,
+        "format": fmt,
+        "first_byte_s": first_byte,
+        "total_s": time.perf_counter() - start,
+        "mb": size / 1024 / 1024,
+        "rss_before_mb": rss_before,
+        "hwm_after_mb": memory_mb(pid, "VmHWM") if pid else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the streaming export routes")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--pid", type=int, default=None, help="server process id, for memory figures")
+    parser.add_argument("--route", choices=ROUTES, action="append")
+    parser.add_argument("--format", choices=FORMATS, action="append")
+    args = parser.parse_args()
+
+    # One export first, so connection pools and imports are warm
+    requests.get(f"{args.url}/export/provider-scores", params={"format": "ndjson"}, timeout=600).close()
+
+    for route in args.route or ROUTES:
+        for fmt in args.format or FORMATS:
+            r = measure(args.url, args.pid, route, fmt)
+            line = (
+                f"{r['route']:<16} {r['format']:<7} first byte {r['first_byte_s']:.3f}s  "
+                f"total {r['total_s']:.2f}s  {r['mb']:,.1f} MB"
+            )
+            if args.pid:
+                line += f"  server RSS {r['rss_before_mb']:.0f} MB -> peak {r['hwm_after_mb']:.0f} MB"
+            print(line)
@@ -1,13 +1,18 @@
+import argparse
 import os
-import random
-import uuid
-from datetime import datetime, timedelta
-import psycopg2
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+
 import numpy as np
+import pandas as pd
 from dotenv import load_dotenv
+from bulk_load import bulk_load, copy_frame, get_connection, upsert_frame
+from claims_partitions import ensure_partitions, month_range
 
 # CONFIG
 NUM_PROVIDERS = 500
+PROVIDERS_PER_BLOCK = 2000
 CPT_CODES = ["99213", "99214", "99203", "20610", "93000", "77066", "96372"]
 ICD_CODES = ["I10", "E11.9", "M54.5", "J06.9", "R51"]
 PLACES = ["Office", "Hospital", "Clinic"]
@@ -23,102 +28,270 @@ SPECIALTIES = [
     "Endocrinology"
 ]
 
-load_dotenv()
+BASE_AMOUNT = np.array([75, 110, 125, 200, 50, 180, 30], dtype=np.float64)  # per CPT_CODES
+
+# Claims per provider: lognormal around 40 gives a heavy right tail
+MEDIAN_CLAIMS = 40
+VOLUME_SIGMA = 0.75
+# Service dates fall in the DAYS_BACK days up to end_date
+DAYS_BACK = 366
+
+# Fraud injection
+FRAUD_RATE = 0.05
+FRAUD_PATTERNS = ["volume", "upcoding", "spike"]
+UPCODE_FROM, UPCODE_TO = CPT_CODES.index("99213"), CPT_CODES.index("99214")
 
-conn = psycopg2.connect(
-    dbname=os.getenv("DB_NAME"),
-    user=os.getenv("DB_USER"),
-    password=os.getenv("DB_PASSWORD"),
-    host=os.getenv("DB_HOST"),
-    port=os.getenv("DB_PORT")
-)
+# claim_id = run id (15 bits) | block id (16 bits) | row in block (32 bits).
+# Postgres runs take their run id from a sequence, so repeated runs never
+# reuse ids; run id 0 is the pre-sequence layout (block << 32 | row).
+RUN_ID_BITS = 15
+BLOCK_ID_BITS = 16
+ROW_ID_BITS = 32
+
+CLAIM_COLUMNS = [
+    "claim_id", "provider_id", "patient_id",
+    "cpt_code", "icd_code", "service_date",
+    "claim_amount", "place_of_service",
+]
+
+load_dotenv()
 
-cur = conn.cursor()
 
 # --------------------------------------------------
 # STEP 1: Generate Providers First
 # --------------------------------------------------
 
-providers = []
+def generate_providers(num_providers, seed):
+    rng = np.random.default_rng([seed, 0])
 
-for _ in range(NUM_PROVIDERS):
-    provider_id = random.randint(1000000000, 1999999999)
-    specialty = random.choice(SPECIALTIES)
-    providers.append((provider_id, specialty))
+    provider_id = 1_000_000_000 + rng.choice(1_000_000_000, size=num_providers, replace=False)
+    is_fraud = rng.random(num_providers) < FRAUD_RATE
+    pattern = np.where(
+        is_fraud,
+        rng.choice(FRAUD_PATTERNS, size=num_providers),
+        None,
+    )
 
-insert_providers = """
-INSERT INTO providers (provider_id, specialty)
-VALUES (%s, %s)
-"""
+    return pd.DataFrame({
+        "provider_id": provider_id.astype(np.int64),
+        "specialty": rng.choice(SPECIALTIES, size=num_providers),
+        "is_fraud": is_fraud,
+        "fraud_pattern": pattern,
+    })
 
-cur.executemany(insert_providers, providers)
-conn.commit()
 
 # --------------------------------------------------
-# STEP 2: Generate Claims Using Those Providers
+# STEP 2: Generate Claims in vectorized blocks
 # --------------------------------------------------
 
-def random_date():
-    return datetime.now() - timedelta(days=random.randint(0, 365))
+def claim_ids(run_id, block_id, n):
+    base = (np.int64(run_id) << (BLOCK_ID_BITS + ROW_ID_BITS)) + (np.int64(block_id) << ROW_ID_BITS)
+    return base + np.arange(n, dtype=np.int64)
+
+
+def allocate_run_id():
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                CREATE SEQUENCE IF NOT EXISTS synthetic_claim_run_seq
+                    MINVALUE 1 MAXVALUE {2 ** RUN_ID_BITS - 1}
+            """)
+            cur.execute("SELECT nextval('synthetic_claim_run_seq')")
+            run_id = cur.fetchone()[0]
+        conn.commit()
+        return run_id
+    finally:
+        conn.close()
+
+
+def generate_claims_block(block_id, providers, seed, end_date, run_id=0):
+    # Each block has its own stream, so any block can be (re)built by any
+    # process and the output does not depend on the worker count.
+    rng = np.random.default_rng([seed, 1, block_id])
+    n_prov = len(providers)
+    fraud = providers["fraud_pattern"].to_numpy()
+
+    # Heavy-tailed volume, inflated 5-15x for volume fraud
+    lam = rng.lognormal(np.log(MEDIAN_CLAIMS), VOLUME_SIGMA, n_prov)
+    lam = np.where(fraud == "volume", lam * rng.integers(5, 16, n_prov), lam)
+    counts = rng.poisson(lam)
+
+    prov_idx = np.repeat(np.arange(n_prov), counts)
+    n = len(prov_idx)
+
+    # Per-provider CPT mix (Dirichlet) so providers are not uniform copies
+    mix = rng.dirichlet(np.ones(len(CPT_CODES)), n_prov)
+    upcoders = fraud == "upcoding"
+    mix[upcoders, UPCODE_TO] += mix[upcoders, UPCODE_FROM]
+    mix[upcoders, UPCODE_FROM] = 0.0
+    cum = mix.cumsum(axis=1)
+    cum[:, -1] = 1.0
+    cpt_idx = (rng.random(n)[:, None] > cum[prov_idx]).sum(axis=1)
+
+    # Amounts around the CPT base price; inflated 1.5-3x for fraud providers
+    base = BASE_AMOUNT[cpt_idx]
+    amount = rng.normal(base, base * 0.15)
+    inflate = np.where(pd.notna(fraud), rng.uniform(1.5, 3.0, n_prov), 1.0)
+    amount = np.round(amount * inflate[prov_idx], 2)
 
-claims_to_insert = []
+    # Service dates over the last year; spike fraud packs claims into one month
+    days_back = rng.integers(0, DAYS_BACK, n)
+    spike_start = rng.integers(0, DAYS_BACK - 30, n_prov)
+    spiking = (fraud == "spike")[prov_idx]
+    days_back = np.where(spiking, spike_start[prov_idx] + rng.integers(0, 30, n), days_back)
+    service_date = np.datetime64(end_date, "D") - days_back.astype("timedelta64[D]")
 
-for provider_id, specialty in providers:
+    return pd.DataFrame({
+        # run- and block-scoped ids: unique across blocks without any
+        # coordination, and across runs through the run id
+        "claim_id": claim_ids(run_id, block_id, n),
+        "provider_id": providers["provider_id"].to_numpy()[prov_idx],
+        "patient_id": rng.integers(0, max(n_prov * 200, 1), n),
+        "cpt_code": np.asarray(CPT_CODES)[cpt_idx],
+        "icd_code": rng.choice(ICD_CODES, n),
+        "service_date": service_date,
+        "claim_amount": amount,
+        "place_of_service": rng.choice(PLACES, n),
+    }, columns=CLAIM_COLUMNS)
 
-    base_claims = np.random.poisson(lam=40)
 
-    # 5% fraud injection
-    is_fraud = random.random() < 0.05
-    if is_fraud:
-        base_claims *= random.randint(5, 15)
+# --------------------------------------------------
+# STEP 3: Sinks (Postgres COPY or Parquet)
+# --------------------------------------------------
+
+def _write_block(block_id, providers, seed, end_date, sink, out_dir, run_id):
+    start = time.perf_counter()
+    claims = generate_claims_block(block_id, providers, seed, end_date, run_id)
+
+    if sink == "parquet":
+        claims.to_parquet(
+            os.path.join(out_dir, "claims", f"claims-{block_id:06d}.parquet"),
+            index=False,
+        )
+    else:
+        conn = get_connection()
+        try:
+            copy_frame(conn, claims, "claims", CLAIM_COLUMNS)
+        finally:
+            conn.close()
+
+    return block_id, len(claims), time.perf_counter() - start
 
-    for _ in range(base_claims):
 
-        cpt = random.choice(CPT_CODES)
-        icd = random.choice(ICD_CODES)
+def _write_providers(providers, sink, out_dir):
+    if sink == "parquet":
+        providers.to_parquet(os.path.join(out_dir, "providers.parquet"), index=False)
+        return
 
-        base_amount = {
-            "99213": 75,
-            "99214": 110,
-            "99203": 125,
-            "20610": 200,
-            "93000": 50,
-            "77066": 180,
-            "96372": 30,
-        }[cpt]
+    bulk_load([("providers", providers[["provider_id", "specialty"]], "provider_id")])
 
-        claim_amount = round(
-            np.random.normal(base_amount, base_amount * 0.15), 2
+    # Ground-truth labels for precision/recall checks on the risk views
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS synthetic_fraud_labels (
+                    provider_id BIGINT PRIMARY KEY,
+                    is_fraud BOOLEAN NOT NULL,
+                    fraud_pattern TEXT
+                )
+            """)
+        conn.commit()
+        upsert_frame(
+            conn,
+            "synthetic_fraud_labels",
+            providers[["provider_id", "is_fraud", "fraud_pattern"]],
+            key="provider_id",
         )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def generate(
+    num_providers=NUM_PROVIDERS,
+    providers_per_block=PROVIDERS_PER_BLOCK,
+    seed=42,
+    sink="postgres",
+    out_dir="data/synthetic",
+    workers=os.cpu_count(),
+    end_date=None,
+    run_id=None,
+):
+    end_date = end_date or datetime.now().strftime("%Y-%m-%d")
+    if sink == "parquet":
+        os.makedirs(os.path.join(out_dir, "claims"), exist_ok=True)
+
+    # Parquet output stays reproducible: its run id defaults to the seed
+    if run_id is None:
+        run_id = allocate_run_id() if sink == "postgres" else seed % 2 ** RUN_ID_BITS
+    if not 0 <= run_id < 2 ** RUN_ID_BITS:
+        raise ValueError(f"run_id must be in [0, {2 ** RUN_ID_BITS})")
+    if -(-num_providers // providers_per_block) > 2 ** BLOCK_ID_BITS:
+        raise ValueError(f"At most {2 ** BLOCK_ID_BITS} blocks; raise providers_per_block")
+
+    providers = generate_providers(num_providers, seed)
+    _write_providers(providers, sink, out_dir)
+    print(f"Generated {len(providers)} providers ({int(providers['is_fraud'].sum())} fraud).")
+
+    if sink == "postgres":
+        # Attach every month a claim can fall in before the blocks COPY in
+        # parallel, so none of them lands in claims_default
+        end = date.fromisoformat(end_date)
+        conn = get_connection()
+        try:
+            ensure_partitions(conn, months=month_range(end - timedelta(days=DAYS_BACK - 1), end))
+        finally:
+            conn.close()
+
+    blocks = range(0, num_providers, providers_per_block)
+    start = time.perf_counter()
+    total = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                _write_block,
+                b // providers_per_block,
+                providers.iloc[b:b + providers_per_block],
+                seed,
+                end_date,
+                sink,
+                out_dir,
+                run_id,
+            )
+            for b in blocks
+        ]
+        for f in futures:
+            block_id, rows, seconds = f.result()
+            total += rows
+            print(f"  block {block_id}: {rows} claims in {seconds:.2f}s")
+
+    elapsed = time.perf_counter() - start
+    print(f"Inserted {total} claims (run id {run_id}) in {elapsed:.1f}s ({total / elapsed:,.0f} claims/sec).")
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic claims generator")
+    parser.add_argument("--providers", type=int, default=NUM_PROVIDERS)
+    parser.add_argument("--providers-per-block", type=int, default=PROVIDERS_PER_BLOCK)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--sink", choices=["postgres", "parquet"], default="postgres")
+    parser.add_argument("--out-dir", default="data/synthetic")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--end-date", default=None, help="YYYY-MM-DD, defaults to today")
+    parser.add_argument("--run-id", type=int, default=None, help="claim id prefix, allocated by default")
+    args = parser.parse_args()
 
-        # Fraud providers inflate payment
-        if is_fraud:
-            claim_amount *= random.uniform(1.5, 3.0)
-
-        claims_to_insert.append((
-            str(uuid.uuid4()),
-            provider_id,
-            str(uuid.uuid4()),
-            cpt,
-            icd,
-            random_date(),
-            claim_amount,
-            random.choice(PLACES)
-        ))
-
-insert_claims = """
-INSERT INTO claims (
-    claim_id, provider_id, patient_id,
-    cpt_code, icd_code, service_date,
-    claim_amount, place_of_service
-)
-VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-"""
-
-cur.executemany(insert_claims, claims_to_insert)
-conn.commit()
-
-print(f"Inserted {len(claims_to_insert)} claims.")
-
-cur.close()
-conn.close()
\ No newline at end of file
+    generate(
+        num_providers=args.providers,
+        providers_per_block=args.providers_per_block,
+        seed=args.seed,
+        sink=args.sink,
+        out_dir=args.out_dir,
+        workers=args.workers,
+        end_date=args.end_date,
+        run_id=args.run_id,
+    )
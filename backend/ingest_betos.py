@@ -1,7 +1,10 @@
 import os
+import time
 import pandas as pd
 import psycopg2
 from dotenv import load_dotenv
+from bulk_load import upsert_frame
+import ingest_ledger as ledger
 
 # Load environment variables from .env
 load_dotenv()
@@ -14,6 +17,28 @@ DB_PORT = os.getenv("DB_PORT", "5432")
 
 # Path to Excel file
 excel_path = "data/betos-cy-2024.xlsx"
+
+# Connect to Postgres
+try:
+    conn = psycopg2.connect(
+        dbname=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        host=DB_HOST,
+        port=DB_PORT
+    )
+except psycopg2.OperationalError as e:
+    print("Error connecting to the database:", e)
+    exit(1)
+
+# Skip the refresh entirely if this exact file was already loaded
+ledger.ensure_ledger(conn)
+already_loaded, fp = ledger.check_file(conn, "betos", excel_path)
+if already_loaded:
+    print(f"{excel_path} unchanged since last load - skipping")
+    conn.close()
+    exit(0)
+
 df_preview = pd.read_excel(excel_path, header=None)
 print(df_preview.head(10))
 
@@ -45,34 +70,18 @@ for col in numeric_cols:
 # Remove empty rows
 df = df.dropna(subset=["betos_group"])
 
-# Connect to Postgres
-try:
-    conn = psycopg2.connect(
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        host=DB_HOST,
-        port=DB_PORT
-    )
-except psycopg2.OperationalError as e:
-    print("Error connecting to the database:", e)
-    exit(1)
-
-cur = conn.cursor()
-
-# Insert SQL
-insert_sql = """
-INSERT INTO public.betos_metrics (betos_group, allowed_services, allowed_charges, payment_amt)
-VALUES (%s, %s, %s, %s)
-ON CONFLICT (betos_group) DO NOTHING;
-"""
-
-# Insert each row
-for row in df.itertuples(index=False):
-    cur.execute(insert_sql, row)
-
+# Set-based upsert: one COPY into a temp table + one ON CONFLICT merge
+start = time.perf_counter()
+counts = upsert_frame(conn, "public.betos_metrics", df, key="betos_group")
 conn.commit()
+ledger.record_file(conn, "betos", excel_path, fp, len(df))
+print(
+    f"BETOS merge in {time.perf_counter() - start:.2f}s: "
+    f"{counts['inserted']} inserted, {counts['updated']} updated, "
+    f"{counts['unchanged']} unchanged"
+)
 
+cur = conn.cursor()
 cur.execute("SELECT COUNT(*) FROM public.betos_metrics;")
 print(cur.fetchone())
 
@@ -1,7 +1,11 @@
 import os
+from datetime import date
 import pandas as pd # pandas for reading, cleaning and manipulating data
-from sqlalchemy import create_engine # sqlalchemy - used to connect Python to a database
 from dotenv import load_dotenv
+from bulk_load import bulk_load_batches, get_connection, DEFAULT_WORKERS # COPY-based parallel loader
+from claims_partitions import ensure_partitions
+from part_b_reader import iter_part_b_chunks, reservoir_sample, DEFAULT_CHUNKSIZE
+import ingest_ledger as ledger
 
 # Load environment variables
 load_dotenv()
@@ -19,33 +23,17 @@ missing = [v for v in required_env_vars if not os.getenv(v)]
 if missing:
     raise EnvironmentError(f"Missing required env vars: {missing}")
 
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
-DB_NAME = os.getenv("DB_NAME")
+# A Part B row is one provider x HCPCS code x place of service
+CLAIM_KEY = ["provider_id", "cpt_code", "place_of_service"]
+# The summary has no service dates: every row is dated to the data year
+SERVICE_DATE = date(2024, 1, 1)
 
-# ---- DATABASE CONNECTION ----
-engine = create_engine(
-    f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-)
 
-# ---- INGEST MEDICARE PART B DATA ----
-def ingest_part_b(csv_path, sample_size=5000):
-    print("Loading Medicare Part B data...")
-    df = pd.read_csv(csv_path, low_memory=False)
-
-    # Sample to keep MVP manageable
-    df = df.sample(sample_size, random_state=42)
-
-    # Rename columns to match schema
-    df = df.rename(columns={
-        "Rndrng_NPI": "provider_id",
-        "Rndrng_Prvdr_Type": "specialty",
-        "HCPCS_Cd": "cpt_code",
-        "Place_Of_Srvc": "place_of_service",
-        "Avg_Sbmtd_Chrg_Amt": "claim_amount"
-    })
+# ---- SHAPE ROWS FOR THE SCHEMA ----
+def build_frames(df):
+    # df has already been renamed by part_b_reader; returns the
+    # (table, frame, key) list that bulk_load expects
+    df = df.copy()
 
     # Ensure optional CMS fields exist
     if "claim_amount" not in df.columns:
@@ -56,10 +44,13 @@ def ingest_part_b(csv_path, sample_size=5000):
         print("place_of_service not found - creating default values")
         df["place_of_service"] = "UNK"
 
-    # Create synthetic fields
-    df["claim_id"] = df.index.astype(str)
-    df["patient_id"] = "PAT" + (df.index % 1000).astype(str)
-    df["service_date"] = pd.to_datetime("2024-01-01")
+    # Create synthetic fields. claim_id is a hash of the row's natural key,
+    # so a re-delivered row with changed values keeps its id and is updated
+    # in place by the merge instead of being loaded a second time.
+    hashes = ledger.row_hashes(df, CLAIM_KEY)
+    df["claim_id"] = ledger.row_keys(hashes)
+    df["patient_id"] = "PAT" + (hashes % 1000).astype(str)
+    df["service_date"] = pd.Timestamp(SERVICE_DATE)
     df["icd_code"] = "Z00.00"
 
     # ---- Providers table ----
@@ -90,23 +81,82 @@ def ingest_part_b(csv_path, sample_size=5000):
 
     claims = df[claims_cols]
 
-    print(f"Inserting {len(providers)} providers...")
-    providers.to_sql(
-        "providers",
-        engine,
-        if_exists="append",
-        index=False,
-        method="multi"
-    )
+    return [
+        ("providers", providers, "provider_id"),
+        ("claims", claims, "claim_id"),
+    ]
 
-    print(f"Inserting {len(claims)} claims...")
-    claims.to_sql(
-        "claims",
-        engine,
-        if_exists="append",
-        index=False,
-        method="multi"
-    )
+
+# ---- INGEST MEDICARE PART B DATA ----
+def ingest_part_b(
+    csv_path,
+    sample_size=5000,
+    mode="sample",
+    stratify_by=None,
+    chunksize=DEFAULT_CHUNKSIZE,
+    workers=DEFAULT_WORKERS,
+    force=False,
+):
+    # mode="sample": one-pass reservoir sample of sample_size rows
+    #   (optionally stratified, e.g. stratify_by="specialty")
+    # mode="full": every row, streamed chunk by chunk
+    # Either way only one chunk (plus the sample) is held in memory.
+    # The sample parameters are part of the source, so asking for a
+    # different sample of an already loaded file is not skipped
+    if mode == "sample":
+        source = f"part_b:sample:{sample_size}:{stratify_by or 'all'}"
+    else:
+        source = f"part_b:{mode}"
+    conn = get_connection()
+    try:
+        ledger.ensure_ledger(conn)
+
+        # ---- Skip files we have already loaded ----
+        already_loaded, fp = ledger.check_file(conn, source, csv_path)
+        if already_loaded and not force:
+            print(f"{csv_path} unchanged since last load - skipping")
+            return
+
+        print(f"Loading Medicare Part B data ({mode})...")
+        chunks = iter_part_b_chunks(csv_path, chunksize=chunksize)
+        new_chunks = []
+        row_count = 0
+
+        if mode == "sample":
+            df = reservoir_sample(chunks, sample_size, stratify_by=stratify_by)
+            row_count = len(df)
+            batches = [build_frames(df)]
+        elif mode == "full":
+            seen = ledger.loaded_chunks(conn, source)
+
+            def changed_chunks():
+                # Only chunks whose content checksum is new are loaded
+                nonlocal row_count
+                for chunk in chunks:
+                    row_count += len(chunk)
+                    hashes = ledger.row_hashes(chunk, sorted(chunk.columns))
+                    checksum = ledger.chunk_checksum(hashes)
+                    if checksum in seen:
+                        continue
+                    new_chunks.append((checksum, len(chunk)))
+                    yield build_frames(chunk)
+
+            batches = changed_chunks()
+        else:
+            raise ValueError(f"Unknown mode: {mode}")
+
+        # ---- Bulk load: COPY -> unlogged staging -> merge ----
+        # The month's partition must exist first, or the rows go to claims_default
+        ensure_partitions(conn, months=[SERVICE_DATE])
+        print(f"Bulk loading with {workers} workers...")
+        bulk_load_batches(batches, workers=workers, update=("providers", "claims"))
+
+        if mode == "full":
+            print(f"{len(new_chunks)} new or changed chunks loaded")
+            ledger.record_chunks(conn, source, new_chunks)
+        ledger.record_file(conn, source, csv_path, fp, row_count)
+    finally:
+        conn.close()
 
     print("Medicare Part B ingestion complete ✅")
 
@@ -1,13 +1,32 @@
 import pandas as pd
 import psycopg2
 import os
+import time
 from dotenv import load_dotenv
+from bulk_load import upsert_frame
+import ingest_ledger as ledger
 
 load_dotenv()
 
 CSV_PATH = "data/RBCS_Taxonomy_RY2025.csv"
 
-def ingest_rbcs():
+def ingest_rbcs(force=False):
+    conn = psycopg2.connect(
+        dbname=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST"),
+        port=os.getenv("DB_PORT"),
+    )
+
+    # Skip the refresh entirely if this exact file was already loaded
+    ledger.ensure_ledger(conn)
+    already_loaded, fp = ledger.check_file(conn, "rbcs", CSV_PATH)
+    if already_loaded and not force:
+        conn.close()
+        print(f"{CSV_PATH} unchanged since last load - skipping")
+        return None
+
     df = pd.read_csv(CSV_PATH)
 
     # Normalize columns
@@ -35,37 +54,22 @@ def ingest_rbcs():
         "rbcs_major_ind"
     ]].drop_duplicates()
 
-    conn = psycopg2.connect(
-        dbname=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD"),
-        host=os.getenv("DB_HOST"),
-        port=os.getenv("DB_PORT"),
-    )
-
-    cur = conn.cursor()
-
-    for _, row in df.iterrows():
-        cur.execute("""
-            INSERT INTO rbcs_taxonomy (
-                hcpcs_cd,
-                rbcs_id,
-                rbcs_cat,
-                rbcs_cat_desc,
-                rbcs_subcat,
-                rbcs_subcat_desc,
-                rbcs_family_desc,
-                rbcs_major_ind
-            )
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-            ON CONFLICT (hcpcs_cd) DO NOTHING;
-        """, tuple(row))
+    # One COPY into a temp table + one ON CONFLICT merge
+    start = time.perf_counter()
+    try:
+        counts = upsert_frame(conn, "rbcs_taxonomy", df, key="hcpcs_cd")
+        conn.commit()
+        ledger.record_file(conn, "rbcs", CSV_PATH, fp, len(df))
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - start
 
-    conn.commit()
-    cur.close()
-    conn.close()
-
-    print(f"RBCS ingest complete: {len(df)} rows processed")
+    print(
+        f"RBCS ingest complete: {len(df)} rows processed in {elapsed:.2f}s "
+        f"({counts['inserted']} inserted, {counts['updated']} updated, "
+        f"{counts['unchanged']} unchanged)"
+    )
+    return counts
 
 if __name__ == "__main__":
     ingest_rbcs()
@@ -0,0 +1,163 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import time
+
+import pandas as pd
+
+from bulk_load import get_connection
+from dashboard.binning import histogram
+from dashboard.rendering import FORMATS, Chart, prune_cache, render_many
+
+# Nightly management pack: the same set of charts for every specialty,
+# written to <out>/run-<scoring run id>/<specialty>/ with a manifest.json.
+#
+# Charts are rendered through dashboard.rendering, so a specialty whose data
+# did not change since the last pack is copied from the image cache rather
+# than re-drawn, and the misses are drawn in parallel across processes.
+
+HIST_BINS = 30
+TOP_PROVIDERS = 10
+
+
+def read_frame(cur, sql, params=None):
+    cur.execute(sql, params)
+    columns = [d[0] for d in cur.description]
+    return pd.DataFrame.from_records(cur.fetchall(), columns=columns, coerce_float=True)
+
+
+def latest_run_id(cur):
+    cur.execute("SELECT MAX(run_id) FROM scoring_runs WHERE status = 'complete'")
+    return cur.fetchone()[0]
+
+
+def slugify(name):
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-") or "unknown"
+
+
+def specialty_dirs(specialties):
+    """
+    {specialty: directory name}. Specialties whose slugs collide ("Ob/Gyn",
+    "OB-GYN") get -2, -3, ... in the order given.
+    """
+    dirs, taken = {}, set()
+    for specialty in specialties:
+        slug = base = slugify(specialty)
+        n = 2
+        while slug in taken:
+            slug = f"{base}-{n}"
+            n += 1
+        taken.add(slug)
+        dirs[specialty] = slug
+    return dirs
+
+
+def specialty_charts(cur, fmt):
+    """Chart specs per specialty: {specialty: {chart name: Chart}}."""
+    tiers = read_frame(cur, """
+        SELECT specialty, risk_tier, COUNT(*) AS count
+        FROM provider_profile
+        GROUP BY specialty, risk_tier
+    """)
+    top = read_frame(cur, """
+        SELECT specialty, provider_id, claims_peer_z
+        FROM (
+            SELECT
+                specialty,
+                provider_id,
+                claims_peer_z,
+                ROW_NUMBER() OVER (
+                    PARTITION BY specialty
+                    ORDER BY claims_peer_z DESC, provider_id
+                ) AS rn
+            FROM provider_profile
+            WHERE claims_peer_z IS NOT NULL
+        ) ranked
+        WHERE rn <= %(limit)s
+    """, {"limit": TOP_PROVIDERS})
+
+    charts = {}
+    for specialty in sorted(tiers["specialty"].unique()):
+        peer_bins = histogram(cur, "peer_z", HIST_BINS, specialty=specialty)
+        spike_bins = histogram(cur, "spike", HIST_BINS, specialty=specialty)
+        charts[specialty] = {
+            "risk_tiers": Chart(
+                "risk_tiers",
+                tiers.loc[tiers["specialty"] == specialty, ["risk_tier", "count"]].reset_index(drop=True),
+                {"title": f"{specialty}: Risk Tier Distribution"},
+                fmt,
+            ),
+            "peer_z": Chart("histogram", peer_bins, {
+                "title": f"{specialty}: Peer Z-Score Distribution",
+                "xlabel": "Claims Peer Z-Score",
+                "threshold": 3,
+            }, fmt),
+            "spike": Chart("histogram", spike_bins, {
+                "title": f"{specialty}: Temporal Spike Risk Distribution",
+                "xlabel": "Max Spike Z-Score",
+                "color": "#9467bd",
+                "threshold": 3,
+            }, fmt),
+            "top_providers": Chart(
+                "top_providers",
+                top.loc[top["specialty"] == specialty, ["provider_id", "claims_peer_z"]].reset_index(drop=True),
+                {"title": f"{specialty}: Top {TOP_PROVIDERS} Riskiest Providers", "limit": TOP_PROVIDERS},
+                fmt,
+            ),
+        }
+    return charts
+
+
+def _publish(src, dest):
+    # Hard link out of the cache when on the same filesystem
+    if os.path.exists(dest):
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+def build_pack(out_dir, fmt="png", workers=None):
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            run_id = latest_run_id(cur)
+            if run_id is None:
+                raise RuntimeError("No completed scoring run")
+            charts = specialty_charts(cur, fmt)
+    finally:
+        conn.close()
+
+    flat = [(s, name, chart) for s, by_name in charts.items() for name, chart in by_name.items()]
+    t0 = time.perf_counter()
+    paths = render_many([chart for _, _, chart in flat], workers=workers)
+    print(f"Rendered {len(paths)} charts for {len(charts)} specialties in {time.perf_counter() - t0:.2f}s")
+
+    pack_dir = os.path.join(out_dir, f"run-{run_id}")
+    manifest = {"run_id": run_id, "format": fmt, "specialties": {}}
+    dirs = specialty_dirs(charts)
+    for (specialty, name, _), path in zip(flat, paths):
+        dest_dir = os.path.join(pack_dir, dirs[specialty])
+        os.makedirs(dest_dir, exist_ok=True)
+        dest = os.path.join(dest_dir, f"{name}.{fmt}")
+        _publish(path, dest)
+        manifest["specialties"].setdefault(specialty, {})[name] = os.path.relpath(dest, pack_dir)
+
+    with open(os.path.join(pack_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return pack_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the per-specialty management pack")
+    parser.add_argument("--out", default="management_pack", help="output directory")
+    parser.add_argument("--format", choices=FORMATS, default="png")
+    parser.add_argument("--workers", type=int, default=None, help="render processes")
+    args = parser.parse_args()
+
+    pack_dir = build_pack(args.out, args.format, args.workers)
+    print(f"Management pack written to {pack_dir}")
+    print(f"Pruned {prune_cache()} stale cached charts")
@@ -0,0 +1,109 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+# CMS column -> schema column. Only these columns are parsed from the file.
+COLUMN_MAP = {
+    "Rndrng_NPI": "provider_id",
+    "Rndrng_Prvdr_Type": "specialty",
+    "HCPCS_Cd": "cpt_code",
+    "Place_Of_Srvc": "place_of_service",
+    "Avg_Sbmtd_Chrg_Amt": "claim_amount",
+}
+
+# Applied by the parser so no chunk is ever materialized as object/float64 first
+DTYPES = {
+    "Rndrng_NPI": "Int64",
+    "Rndrng_Prvdr_Type": "string",
+    "HCPCS_Cd": "string",
+    "Place_Of_Srvc": "string",
+    "Avg_Sbmtd_Chrg_Amt": "float64",
+}
+
+DEFAULT_CHUNKSIZE = 250_000
+
+
+# ---- STREAMING READER ----
+def iter_part_b_chunks(csv_path, chunksize=DEFAULT_CHUNKSIZE):
+    # Yields renamed DataFrame chunks. The index keeps counting across chunks,
+    # so it is the row's position in the source file.
+    reader = pd.read_csv(
+        csv_path,
+        usecols=lambda c: c in COLUMN_MAP,
+        dtype=DTYPES,
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        yield chunk.rename(columns=COLUMN_MAP)
+
+
+# ---- ONE-PASS SAMPLING ----
+def _allocate(counts, sample_size, allocation):
+    # Per-stratum quota from the stratum sizes seen during the pass
+    if allocation == "equal":
+        per = sample_size // max(len(counts), 1)
+        return {k: min(per, n) for k, n in counts.items()}
+
+    if allocation != "proportional":
+        raise ValueError(f"Unknown allocation: {allocation}")
+
+    total = sum(counts.values())
+    exact = {k: sample_size * n / total for k, n in counts.items()}
+    quotas = {k: min(int(v), counts[k]) for k, v in exact.items()}
+
+    # Largest remainder keeps the quotas summing to sample_size
+    short = min(sample_size, total) - sum(quotas.values())
+    for k in sorted(exact, key=lambda k: exact[k] - int(exact[k]), reverse=True):
+        if short <= 0:
+            break
+        if quotas[k] < counts[k]:
+            quotas[k] += 1
+            short -= 1
+    return quotas
+
+
+def reservoir_sample(
+    chunks,
+    sample_size,
+    stratify_by=None,
+    allocation="proportional",
+    seed=42,
+):
+    """
+    Uniform sample without replacement in a single pass over `chunks`.
+
+    Every row gets a random key and only the `sample_size` smallest keys are
+    kept (bottom-k sampling), so memory is bounded by the sample plus one
+    chunk. With `stratify_by`, the bottom-k is kept per stratum and the final
+    per-stratum quotas are allocated "proportional"ly to stratum size or
+    "equal"ly across strata.
+    """
+    rng = np.random.default_rng(seed)
+    kept = None
+    counts = Counter()
+
+    for chunk in chunks:
+        chunk = chunk.assign(_sample_key=rng.random(len(chunk)))
+        pool = chunk if kept is None else pd.concat([kept, chunk])
+
+        if stratify_by is None:
+            kept = pool.nsmallest(sample_size, "_sample_key")
+        else:
+            counts.update(chunk[stratify_by].fillna("UNK").value_counts().to_dict())
+            kept = (
+                pool.sort_values("_sample_key")
+                .groupby(pool[stratify_by].fillna("UNK"), sort=False)
+                .head(sample_size)
+            )
+
+    if kept is None:
+        return pd.DataFrame(columns=list(COLUMN_MAP.values()))
+
+    if stratify_by is not None:
+        quotas = _allocate(counts, sample_size, allocation)
+        strata = kept[stratify_by].fillna("UNK")
+        rank = kept.groupby(strata, sort=False).cumcount()
+        kept = kept[rank < strata.map(quotas)]
+
+    return kept.drop(columns="_sample_key").sort_index()
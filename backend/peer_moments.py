@@ -0,0 +1,32 @@
+# Peer z-score rules (see "Fixing Raw z-scores" in the README)
+MIN_PEER_GROUP = 5   # groups with fewer providers get no z-score
+Z_CAP = 5.0          # z-scores are capped at +-Z_CAP
+
+# Risk tiers on the provider's peer claims z-score: (tier, lower bound),
+# highest first; anything below the last bound (or without a z-score) is
+# LOW_TIER. The scoring run stores the tier in provider_profile, which the
+# API and the dashboards read.
+RISK_TIERS = [("High", 2.0), ("Medium", 1.0)]
+LOW_TIER = "Low"
+
+
+# ---- SQL ----
+def std_sql(n, total, total_sq):
+    # Sample std from count / sum / sum-of-squares columns
+    return (
+        f"CASE WHEN {n} > 1 THEN "
+        f"SQRT(GREATEST(({total_sq} - {total} * {total} / {n}) / ({n} - 1), 0)) END"
+    )
+
+
+def capped_z_sql(x, mean, std, n):
+    return (
+        f"CASE WHEN {n} < {MIN_PEER_GROUP} THEN NULL "
+        f"WHEN {std} IS NULL OR {std} = 0 THEN 0 "
+        f"ELSE LEAST(GREATEST(({x} - {mean}) / {std}, -{Z_CAP}), {Z_CAP}) END"
+    )
+
+
+def risk_tier_sql(z):
+    whens = " ".join(f"WHEN {z} >= {bound} THEN '{tier}'" for tier, bound in RISK_TIERS)
+    return f"CASE {whens} ELSE '{LOW_TIER}' END"
@@ -0,0 +1,62 @@
+# Provider typeahead, shared by GET /providers/search and the dashboard
+# sidebar (see "Provider search" in the README).
+#
+# A numeric q matches provider_id prefixes: a range scan on
+# providers_provider_id_prefix_idx. Anything else matches providers whose
+# specialty contains every word of q, case-insensitive ("card surg" finds
+# "Cardiac Surgery"). The distinct specialties are read with a loose index
+# scan on providers_specialty_idx (one index probe per specialty), then each
+# matching specialty reads at most `limit` providers from the same index, so
+# neither branch depends on the number of providers.
+
+
+def like_escape(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_sql(q, limit, param="%({})s"):
+    """
+    (sql, params) for the typeahead query q, or None when q has no words.
+
+    param formats a named placeholder: the default suits psycopg2, ":{}"
+    suits SQLAlchemy text().
+    """
+    q = q.strip()
+    if q.isdigit():
+        return f"""
+    SELECT provider_id, specialty, 'provider_id' AS matched_on
+    FROM providers
+    WHERE provider_id::text LIKE {param.format("prefix")}
+    ORDER BY provider_id::text
+    LIMIT {param.format("limit")}
+""", {"prefix": like_escape(q) + "%", "limit": limit}
+
+    patterns = ["%" + like_escape(word) + "%" for word in q.split()]
+    if not patterns:
+        return None
+    return f"""
+    WITH RECURSIVE specialties AS (
+        (SELECT specialty FROM providers WHERE specialty IS NOT NULL ORDER BY specialty LIMIT 1)
+        UNION ALL
+        SELECT (
+            SELECT p.specialty FROM providers p
+            WHERE p.specialty > s.specialty
+            ORDER BY p.specialty
+            LIMIT 1
+        )
+        FROM specialties s
+        WHERE s.specialty IS NOT NULL
+    )
+    SELECT p.provider_id, p.specialty, 'specialty' AS matched_on
+    FROM specialties s
+    CROSS JOIN LATERAL (
+        SELECT provider_id, specialty
+        FROM providers
+        WHERE specialty = s.specialty
+        ORDER BY provider_id
+        LIMIT {param.format("limit")}
+    ) p
+    WHERE s.specialty ILIKE ALL(CAST({param.format("patterns")} AS TEXT[]))
+    ORDER BY p.specialty, p.provider_id
+    LIMIT {param.format("limit")}
+""", {"patterns": patterns, "limit": limit}
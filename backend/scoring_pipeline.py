@@ -0,0 +1,1122 @@
+import argparse
+import re
+import time
+
+from bulk_load import get_connection
+from explanation_topk import EXPLANATION_TOP_K
+from peer_moments import capped_z_sql, risk_tier_sql, std_sql
+
+# Materialized versions of the scoring view chain:
+#   claims -> provider_cpt_usage -> specialty_cpt_baseline -> provider_deviation
+#          -> provider_fraud_score / provider_fraud_explanation
+#          -> provider_risk_summary / provider_peer_comparison_strict
+#   claims -> cpt_complexity_view
+#   claims -> provider_spike_risk_score
+# Each *_mat table has the same columns as the view it replaces, plus the
+# indexes the API reads need. provider_risk_summary_mat and
+# provider_peer_comparison_mat are filled from those views' live definitions
+# (see live_view_sql), read over the upstream *_mat tables.
+#
+# Claims are never rescanned by an incremental run. A trigger on claims
+# aggregates every insert into scoring_pending_usage (per provider x CPT
+# deltas); a run drains those deltas into running count / sum /
+# sum-of-squares accumulators (peer_cpt_moments, specialty_claims_moments)
+# and rebuilds only the (specialty, cpt_code) peer groups they touched.
+#
+# Spike risk works per service month instead: the trigger also queues the
+# months that received claims, and a run recounts only those months (one
+# partition each, see claims_partitions.py) into provider_monthly_claims.
+SCHEMA_DDL = """
+CREATE TABLE IF NOT EXISTS scoring_runs (
+    run_id BIGSERIAL PRIMARY KEY,
+    mode TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'running',
+    peer_groups_refreshed INT,
+    started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    finished_at TIMESTAMPTZ
+);
+
+CREATE TABLE IF NOT EXISTS scoring_pending_usage (
+    provider_id BIGINT NOT NULL,
+    cpt_code TEXT NOT NULL,
+    claims BIGINT NOT NULL,
+    amount_claims BIGINT NOT NULL,
+    amount_total NUMERIC NOT NULL,
+    PRIMARY KEY (provider_id, cpt_code)
+);
+
+CREATE TABLE IF NOT EXISTS scoring_pending_months (
+    month DATE PRIMARY KEY
+);
+
+-- Set when claims were updated or deleted: the accumulators only take
+-- inserts, so the next run rebuilds from claims instead
+CREATE TABLE IF NOT EXISTS scoring_pending_full (
+    queued_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- ---- Running accumulators ----
+CREATE TABLE IF NOT EXISTS peer_cpt_moments (
+    specialty TEXT NOT NULL,
+    cpt_code TEXT NOT NULL,
+    n_providers BIGINT NOT NULL,
+    sum_usage NUMERIC NOT NULL,
+    sumsq_usage NUMERIC NOT NULL,
+    PRIMARY KEY (specialty, cpt_code)
+);
+
+CREATE TABLE IF NOT EXISTS provider_claim_totals (
+    provider_id BIGINT PRIMARY KEY,
+    specialty TEXT NOT NULL,
+    total_claims BIGINT NOT NULL,
+    amount_claims BIGINT NOT NULL,
+    amount_total NUMERIC NOT NULL
+);
+CREATE INDEX IF NOT EXISTS provider_claim_totals_specialty_idx
+    ON provider_claim_totals (specialty);
+
+CREATE TABLE IF NOT EXISTS specialty_claims_moments (
+    specialty TEXT PRIMARY KEY,
+    n_providers BIGINT NOT NULL,
+    sum_claims NUMERIC NOT NULL,
+    sumsq_claims NUMERIC NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS provider_monthly_claims (
+    provider_id BIGINT NOT NULL,
+    month DATE NOT NULL,
+    claims BIGINT NOT NULL,
+    PRIMARY KEY (provider_id, month)
+);
+CREATE INDEX IF NOT EXISTS provider_monthly_claims_month_idx
+    ON provider_monthly_claims (month);
+
+-- ---- Materialized stages ----
+CREATE TABLE IF NOT EXISTS provider_cpt_usage_mat (
+    provider_id BIGINT NOT NULL,
+    specialty TEXT NOT NULL,
+    cpt_code TEXT NOT NULL,
+    usage_count BIGINT NOT NULL,
+    PRIMARY KEY (provider_id, cpt_code)
+);
+CREATE INDEX IF NOT EXISTS provider_cpt_usage_mat_group_idx
+    ON provider_cpt_usage_mat (specialty, cpt_code);
+
+CREATE TABLE IF NOT EXISTS specialty_cpt_baseline_mat (
+    specialty TEXT NOT NULL,
+    cpt_code TEXT NOT NULL,
+    n_providers BIGINT NOT NULL,
+    avg_usage NUMERIC NOT NULL,
+    std_usage NUMERIC,
+    PRIMARY KEY (specialty, cpt_code)
+);
+
+CREATE TABLE IF NOT EXISTS provider_deviation_mat (
+    provider_id BIGINT NOT NULL,
+    specialty TEXT NOT NULL,
+    cpt_code TEXT NOT NULL,
+    usage_count BIGINT NOT NULL,
+    avg_usage NUMERIC NOT NULL,
+    deviation NUMERIC NOT NULL,
+    usage_z NUMERIC,
+    PRIMARY KEY (provider_id, cpt_code)
+);
+CREATE INDEX IF NOT EXISTS provider_deviation_mat_group_idx
+    ON provider_deviation_mat (specialty, cpt_code);
+
+CREATE TABLE IF NOT EXISTS provider_peer_risk_mat (
+    provider_id BIGINT PRIMARY KEY,
+    specialty TEXT NOT NULL,
+    total_claims BIGINT NOT NULL,
+    claims_peer_z NUMERIC
+);
+CREATE INDEX IF NOT EXISTS provider_peer_risk_mat_specialty_idx
+    ON provider_peer_risk_mat (specialty);
+
+CREATE TABLE IF NOT EXISTS cpt_complexity_mat (
+    cpt_code TEXT PRIMARY KEY,
+    rbcs_id TEXT,
+    rbcs_cat_desc TEXT,
+    complexity_score INT,
+    risk_level TEXT,
+    total_claims BIGINT NOT NULL,
+    avg_claim_amount NUMERIC,
+    amount_claims BIGINT NOT NULL,
+    amount_total NUMERIC NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cpt_complexity_mat_keyset_idx
+    ON cpt_complexity_mat (complexity_score DESC, total_claims DESC, cpt_code DESC);
+
+CREATE TABLE IF NOT EXISTS provider_fraud_score_mat (
+    provider_id BIGINT PRIMARY KEY,
+    fraud_risk_score NUMERIC NOT NULL
+);
+CREATE INDEX IF NOT EXISTS provider_fraud_score_mat_score_idx
+    ON provider_fraud_score_mat (fraud_risk_score DESC);
+
+CREATE TABLE IF NOT EXISTS provider_fraud_explanation_mat (
+    provider_id BIGINT NOT NULL,
+    specialty TEXT NOT NULL,
+    cpt_code TEXT NOT NULL,
+    usage_count BIGINT NOT NULL,
+    avg_usage NUMERIC NOT NULL,
+    deviation NUMERIC NOT NULL,
+    complexity_score INT,
+    risk_level TEXT,
+    risk_contribution NUMERIC NOT NULL,
+    PRIMARY KEY (provider_id, cpt_code)
+);
+CREATE INDEX IF NOT EXISTS provider_fraud_explanation_mat_contribution_idx
+    ON provider_fraud_explanation_mat (risk_contribution DESC);
+CREATE INDEX IF NOT EXISTS provider_fraud_explanation_mat_group_idx
+    ON provider_fraud_explanation_mat (specialty, cpt_code);
+
+-- Each provider's EXPLANATION_TOP_K highest explanation rows, ranked, for
+-- the per-provider explanation endpoints. Clustered on the primary key by
+-- full runs so one provider's rows share a page or two.
+CREATE TABLE IF NOT EXISTS provider_explanation_topk (
+    provider_id BIGINT NOT NULL,
+    rank INT NOT NULL,
+    cpt_code TEXT NOT NULL,
+    usage_count BIGINT NOT NULL,
+    avg_usage NUMERIC NOT NULL,
+    deviation NUMERIC NOT NULL,
+    complexity_score INT,
+    risk_level TEXT,
+    risk_contribution NUMERIC NOT NULL,
+    PRIMARY KEY (provider_id, rank)
+);
+
+-- Paginated API lists; each has a (sort key, tiebreaker) index for keyset
+-- pages, plus a specialty-prefixed one for the filtered lists
+CREATE TABLE IF NOT EXISTS provider_risk_summary_mat (
+    provider_id BIGINT PRIMARY KEY,
+    specialty TEXT NOT NULL,
+    avg_deviation NUMERIC NOT NULL,
+    total_claims BIGINT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS provider_risk_summary_mat_keyset_idx
+    ON provider_risk_summary_mat (avg_deviation DESC, provider_id DESC);
+CREATE INDEX IF NOT EXISTS provider_risk_summary_mat_specialty_keyset_idx
+    ON provider_risk_summary_mat (specialty, avg_deviation DESC, provider_id DESC);
+
+CREATE TABLE IF NOT EXISTS provider_peer_comparison_mat (
+    provider_id BIGINT NOT NULL,
+    specialty TEXT NOT NULL,
+    cpt_code TEXT NOT NULL,
+    usage_count BIGINT NOT NULL,
+    risk_contribution NUMERIC NOT NULL,
+    peer_rank BIGINT NOT NULL,
+    peer_percentile DOUBLE PRECISION NOT NULL,
+    peer_group_size BIGINT NOT NULL,
+    PRIMARY KEY (provider_id, cpt_code)
+);
+CREATE INDEX IF NOT EXISTS provider_peer_comparison_mat_keyset_idx
+    ON provider_peer_comparison_mat (peer_percentile DESC, provider_id DESC, cpt_code DESC);
+CREATE INDEX IF NOT EXISTS provider_peer_comparison_mat_specialty_keyset_idx
+    ON provider_peer_comparison_mat (specialty, peer_percentile DESC, provider_id DESC, cpt_code DESC);
+
+CREATE TABLE IF NOT EXISTS provider_spike_risk_mat (
+    provider_id BIGINT PRIMARY KEY,
+    max_spike_risk NUMERIC,
+    spike_month DATE,
+    active_months INT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS provider_spike_risk_mat_risk_idx
+    ON provider_spike_risk_mat (max_spike_risk DESC NULLS LAST);
+
+-- One row per provider for the profile endpoint / dashboard drill-down:
+-- the peer, spike and amount figures plus the provider's top CPT
+-- explanations, so a profile is a single primary key lookup
+CREATE TABLE IF NOT EXISTS provider_profile (
+    provider_id BIGINT PRIMARY KEY,
+    specialty TEXT NOT NULL,
+    total_claims BIGINT NOT NULL,
+    avg_claim_amount NUMERIC,
+    claims_peer_z NUMERIC,
+    risk_tier TEXT NOT NULL,
+    max_spike_risk NUMERIC,
+    spike_month DATE,
+    fraud_risk_score NUMERIC,
+    top_explanations JSONB NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS provider_profile_avg_amount_idx
+    ON provider_profile (avg_claim_amount DESC NULLS LAST);
+
+CREATE INDEX IF NOT EXISTS providers_provider_id_idx
+    ON providers (provider_id);
+-- Provider search (/providers/search): provider_id prefix LIKE and
+-- per-specialty listings
+CREATE INDEX IF NOT EXISTS providers_provider_id_prefix_idx
+    ON providers ((provider_id::text) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS providers_specialty_idx
+    ON providers (specialty, provider_id);
+
+-- Upgrade from the rescan-based pipeline (run with --full afterwards)
+DROP TRIGGER IF EXISTS claims_mark_dirty_peer_groups ON claims;
+DROP FUNCTION IF EXISTS scoring_mark_dirty_peer_groups();
+DROP TABLE IF EXISTS scoring_dirty_peer_groups;
+DROP INDEX IF EXISTS cpt_complexity_mat_rank_idx;
+ALTER TABLE specialty_cpt_baseline_mat
+    ADD COLUMN IF NOT EXISTS n_providers BIGINT,
+    ADD COLUMN IF NOT EXISTS std_usage NUMERIC;
+ALTER TABLE provider_deviation_mat
+    ADD COLUMN IF NOT EXISTS usage_z NUMERIC;
+ALTER TABLE cpt_complexity_mat
+    ADD COLUMN IF NOT EXISTS amount_claims BIGINT,
+    ADD COLUMN IF NOT EXISTS amount_total NUMERIC;
+ALTER TABLE provider_claim_totals
+    ADD COLUMN IF NOT EXISTS amount_claims BIGINT,
+    ADD COLUMN IF NOT EXISTS amount_total NUMERIC;
+
+-- Any insert into claims (COPY merge, generator, manual) adds its per
+-- provider x CPT counts to the pending deltas for the next scoring run
+CREATE OR REPLACE FUNCTION scoring_queue_claim_deltas()
+RETURNS trigger AS $$
+BEGIN
+    INSERT INTO scoring_pending_usage AS p (
+        provider_id, cpt_code, claims, amount_claims, amount_total
+    )
+    SELECT
+        provider_id,
+        cpt_code,
+        COUNT(*),
+        COUNT(claim_amount),
+        COALESCE(SUM(claim_amount), 0)
+    FROM new_claims
+    WHERE provider_id IS NOT NULL AND cpt_code IS NOT NULL
+    GROUP BY provider_id, cpt_code
+    ON CONFLICT (provider_id, cpt_code) DO UPDATE
+    SET claims = p.claims + EXCLUDED.claims,
+        amount_claims = p.amount_claims + EXCLUDED.amount_claims,
+        amount_total = p.amount_total + EXCLUDED.amount_total;
+
+    INSERT INTO scoring_pending_months (month)
+    SELECT DISTINCT date_trunc('month', service_date)::date
+    FROM new_claims
+    WHERE service_date IS NOT NULL
+    ON CONFLICT (month) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS claims_queue_scoring_deltas ON claims;
+CREATE TRIGGER claims_queue_scoring_deltas
+    AFTER INSERT ON claims
+    REFERENCING NEW TABLE AS new_claims
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION scoring_queue_claim_deltas();
+
+-- Updates (e.g. a re-delivered Part B row upserted on its natural key) and
+-- deletes cannot be applied as deltas; they make the next run a full one
+CREATE OR REPLACE FUNCTION scoring_queue_full_rebuild()
+RETURNS trigger AS $$
+BEGIN
+    INSERT INTO scoring_pending_full
+    SELECT now()
+    WHERE EXISTS (SELECT 1 FROM old_claims)
+      AND NOT EXISTS (SELECT 1 FROM scoring_pending_full);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS claims_queue_full_on_update ON claims;
+CREATE TRIGGER claims_queue_full_on_update
+    AFTER UPDATE ON claims
+    REFERENCING OLD TABLE AS old_claims
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION scoring_queue_full_rebuild();
+
+DROP TRIGGER IF EXISTS claims_queue_full_on_delete ON claims;
+CREATE TRIGGER claims_queue_full_on_delete
+    AFTER DELETE ON claims
+    REFERENCING OLD TABLE AS old_claims
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION scoring_queue_full_rebuild();
+"""
+
+STATE_TABLES = [
+    "peer_cpt_moments",
+    "provider_claim_totals",
+    "specialty_claims_moments",
+    "provider_cpt_usage_mat",
+    "specialty_cpt_baseline_mat",
+    "provider_deviation_mat",
+    "provider_peer_risk_mat",
+    "cpt_complexity_mat",
+    "provider_fraud_score_mat",
+    "provider_fraud_explanation_mat",
+    "provider_explanation_topk",
+    "provider_risk_summary_mat",
+    "provider_peer_comparison_mat",
+    "provider_monthly_claims",
+    "provider_spike_risk_mat",
+    "provider_profile",
+]
+
+# Analyzed after each run: the API's estimated totals (total_mode=estimated)
+# come from the planner's row estimates for these tables
+API_LIST_TABLES = [
+    "provider_risk_summary_mat",
+    "cpt_complexity_mat",
+    "provider_peer_comparison_mat",
+]
+
+
+# Bump whenever SCHEMA_DDL changes. Recorded as the comment on scoring_runs,
+# so a run checks it with one catalog read instead of re-executing the DDL
+# (DROP/CREATE TRIGGER and ALTER TABLE take ACCESS EXCLUSIVE locks and queue
+# behind any open reader).
+SCHEMA_VERSION = 1
+# The DDL gives up instead of waiting behind long readers (and blocking
+# every query queued behind it)
+SCHEMA_LOCK_TIMEOUT = "10s"
+
+
+def apply_schema(cur):
+    cur.execute(SCHEMA_DDL)
+    cur.execute(f"COMMENT ON TABLE scoring_runs IS 'scoring schema {SCHEMA_VERSION}'")
+
+
+def ensure_schema(conn):
+    # `scoring_pipeline.py --init`: create / upgrade the scoring tables,
+    # indexes and claims triggers
+    with conn.cursor() as cur:
+        cur.execute(f"SET LOCAL lock_timeout = '{SCHEMA_LOCK_TIMEOUT}'")
+        apply_schema(cur)
+    conn.commit()
+
+
+def schema_version(cur):
+    cur.execute("SELECT obj_description(to_regclass('scoring_runs'), 'pg_class')")
+    comment = cur.fetchone()[0] or ""
+    return int(comment.rsplit(" ", 1)[-1]) if comment.startswith("scoring schema ") else None
+
+
+# ---- CLAIM DELTAS TO APPLY ----
+def collect_batch(cur, full):
+    if full:
+        # A full run applies every claim as one batch onto empty
+        # accumulators. SHARE mode blocks inserts (not reads) so the claims
+        # scan and the discarded pending deltas cannot disagree.
+        cur.execute("LOCK TABLE claims IN SHARE MODE")
+        cur.execute("DELETE FROM scoring_pending_usage")
+        cur.execute("DELETE FROM scoring_pending_months")
+        cur.execute("DELETE FROM scoring_pending_full")
+        for table in STATE_TABLES:
+            cur.execute(f"DELETE FROM {table}")
+        cur.execute("""
+            CREATE TEMP TABLE claim_batch ON COMMIT DROP AS
+            SELECT
+                c.provider_id,
+                p.specialty,
+                c.cpt_code,
+                COUNT(*) AS claims,
+                COUNT(c.claim_amount) AS amount_claims,
+                COALESCE(SUM(c.claim_amount), 0) AS amount_total
+            FROM claims c
+            JOIN providers p USING (provider_id)
+            WHERE p.specialty IS NOT NULL AND c.cpt_code IS NOT NULL
+            GROUP BY c.provider_id, p.specialty, c.cpt_code
+        """)
+    else:
+        # Draining inside the run's transaction means deltas queued by a
+        # concurrent ingest land in this run or the next one, never both.
+        # Deltas for providers not loaded yet stay queued.
+        cur.execute("""
+            CREATE TEMP TABLE claim_batch ON COMMIT DROP AS
+            WITH drained AS (
+                DELETE FROM scoring_pending_usage d
+                USING providers p
+                WHERE p.provider_id = d.provider_id
+                  AND p.specialty IS NOT NULL
+                RETURNING d.provider_id, p.specialty, d.cpt_code,
+                          d.claims, d.amount_claims, d.amount_total
+            )
+            SELECT * FROM drained
+        """)
+
+    cur.execute("""
+        CREATE TEMP TABLE touched_groups ON COMMIT DROP AS
+        SELECT DISTINCT specialty, cpt_code FROM claim_batch
+    """)
+    cur.execute("ALTER TABLE touched_groups ADD PRIMARY KEY (specialty, cpt_code)")
+    cur.execute("ANALYZE claim_batch")
+    cur.execute("ANALYZE touched_groups")
+    cur.execute("SELECT COUNT(*) FROM touched_groups")
+    return cur.fetchone()[0]
+
+
+# ---- ACCUMULATORS (O(batch)) ----
+def apply_usage_deltas(cur):
+    # old -> new usage count per provider x CPT; the peer moments move by
+    # n += (old = 0), sum += new - old, sumsq += new^2 - old^2
+    cur.execute("""
+        CREATE TEMP TABLE usage_delta ON COMMIT DROP AS
+        SELECT
+            b.provider_id,
+            b.specialty,
+            b.cpt_code,
+            COALESCE(u.usage_count, 0) AS old_count,
+            COALESCE(u.usage_count, 0) + b.claims AS new_count
+        FROM claim_batch b
+        LEFT JOIN provider_cpt_usage_mat u
+          ON u.provider_id = b.provider_id AND u.cpt_code = b.cpt_code
+    """)
+    cur.execute("""
+        INSERT INTO provider_cpt_usage_mat (provider_id, specialty, cpt_code, usage_count)
+        SELECT provider_id, specialty, cpt_code, new_count FROM usage_delta
+        ON CONFLICT (provider_id, cpt_code) DO UPDATE
+        SET usage_count = EXCLUDED.usage_count
+    """)
+    cur.execute("""
+        INSERT INTO peer_cpt_moments AS m (
+            specialty, cpt_code, n_providers, sum_usage, sumsq_usage
+        )
+        SELECT
+            specialty,
+            cpt_code,
+            COUNT(*) FILTER (WHERE old_count = 0),
+            SUM(new_count - old_count),
+            SUM(new_count * new_count - old_count * old_count)
+        FROM usage_delta
+        GROUP BY specialty, cpt_code
+        ON CONFLICT (specialty, cpt_code) DO UPDATE
+        SET n_providers = m.n_providers + EXCLUDED.n_providers,
+            sum_usage = m.sum_usage + EXCLUDED.sum_usage,
+            sumsq_usage = m.sumsq_usage + EXCLUDED.sumsq_usage
+    """)
+
+
+def apply_provider_totals(cur):
+    # Same bookkeeping one level up: provider claim totals within specialty
+    cur.execute("""
+        CREATE TEMP TABLE totals_delta ON COMMIT DROP AS
+        SELECT
+            b.provider_id,
+            b.specialty,
+            COALESCE(t.total_claims, 0) AS old_total,
+            COALESCE(t.total_claims, 0) + b.claims AS new_total,
+            b.amount_claims,
+            b.amount_total
+        FROM (
+            SELECT
+                provider_id,
+                specialty,
+                SUM(claims) AS claims,
+                SUM(amount_claims) AS amount_claims,
+                SUM(amount_total) AS amount_total
+            FROM claim_batch
+            GROUP BY provider_id, specialty
+        ) b
+        LEFT JOIN provider_claim_totals t ON t.provider_id = b.provider_id
+    """)
+    cur.execute("""
+        INSERT INTO provider_claim_totals AS t (
+            provider_id, specialty, total_claims, amount_claims, amount_total
+        )
+        SELECT provider_id, specialty, new_total, amount_claims, amount_total
+        FROM totals_delta
+        ON CONFLICT (provider_id) DO UPDATE
+        SET total_claims = EXCLUDED.total_claims,
+            amount_claims = t.amount_claims + EXCLUDED.amount_claims,
+            amount_total = t.amount_total + EXCLUDED.amount_total
+    """)
+    cur.execute("""
+        INSERT INTO specialty_claims_moments AS m (
+            specialty, n_providers, sum_claims, sumsq_claims
+        )
+        SELECT
+            specialty,
+            COUNT(*) FILTER (WHERE old_total = 0),
+            SUM(new_total - old_total),
+            SUM(new_total * new_total - old_total * old_total)
+        FROM totals_delta
+        GROUP BY specialty
+        ON CONFLICT (specialty) DO UPDATE
+        SET n_providers = m.n_providers + EXCLUDED.n_providers,
+            sum_claims = m.sum_claims + EXCLUDED.sum_claims,
+            sumsq_claims = m.sumsq_claims + EXCLUDED.sumsq_claims
+    """)
+
+
+def apply_cpt_deltas(cur):
+    cur.execute("""
+        INSERT INTO cpt_complexity_mat AS m (
+            cpt_code, rbcs_id, rbcs_cat_desc, complexity_score, risk_level,
+            total_claims, avg_claim_amount, amount_claims, amount_total
+        )
+        SELECT
+            b.cpt_code,
+            r.rbcs_id,
+            r.rbcs_cat_desc,
+            rc.complexity_score,
+            rc.risk_level,
+            b.claims,
+            b.amount_total / NULLIF(b.amount_claims, 0),
+            b.amount_claims,
+            b.amount_total
+        FROM (
+            SELECT
+                cpt_code,
+                SUM(claims) AS claims,
+                SUM(amount_claims) AS amount_claims,
+                SUM(amount_total) AS amount_total
+            FROM claim_batch
+            GROUP BY cpt_code
+        ) b
+        JOIN rbcs_taxonomy r ON b.cpt_code = r.hcpcs_cd
+        JOIN rbcs_complexity rc ON r.rbcs_id = rc.rbcs_id
+        ON CONFLICT (cpt_code) DO UPDATE
+        SET total_claims = m.total_claims + EXCLUDED.total_claims,
+            amount_claims = m.amount_claims + EXCLUDED.amount_claims,
+            amount_total = m.amount_total + EXCLUDED.amount_total,
+            avg_claim_amount = (m.amount_total + EXCLUDED.amount_total)
+                / NULLIF(m.amount_claims + EXCLUDED.amount_claims, 0)
+    """)
+
+
+# ---- DERIVED STAGES (O(touched peer groups)) ----
+def refresh_baseline(cur):
+    cur.execute(f"""
+        INSERT INTO specialty_cpt_baseline_mat (
+            specialty, cpt_code, n_providers, avg_usage, std_usage
+        )
+        SELECT
+            m.specialty,
+            m.cpt_code,
+            m.n_providers,
+            m.sum_usage / m.n_providers,
+            {std_sql("m.n_providers", "m.sum_usage", "m.sumsq_usage")}
+        FROM peer_cpt_moments m
+        JOIN touched_groups t
+          ON t.specialty = m.specialty AND t.cpt_code = m.cpt_code
+        WHERE m.n_providers > 0
+        ON CONFLICT (specialty, cpt_code) DO UPDATE
+        SET n_providers = EXCLUDED.n_providers,
+            avg_usage = EXCLUDED.avg_usage,
+            std_usage = EXCLUDED.std_usage
+    """)
+
+
+def refresh_deviation(cur):
+    usage_z = capped_z_sql("u.usage_count", "b.avg_usage", "b.std_usage", "b.n_providers")
+    cur.execute(f"""
+        INSERT INTO provider_deviation_mat (
+            provider_id, specialty, cpt_code, usage_count, avg_usage,
+            deviation, usage_z
+        )
+        SELECT
+            u.provider_id,
+            u.specialty,
+            u.cpt_code,
+            u.usage_count,
+            b.avg_usage,
+            (u.usage_count - b.avg_usage),
+            {usage_z}
+        FROM provider_cpt_usage_mat u
+        JOIN touched_groups t
+          ON t.specialty = u.specialty AND t.cpt_code = u.cpt_code
+        JOIN specialty_cpt_baseline_mat b
+          ON b.specialty = u.specialty AND b.cpt_code = u.cpt_code
+        ON CONFLICT (provider_id, cpt_code) DO UPDATE
+        SET usage_count = EXCLUDED.usage_count,
+            avg_usage = EXCLUDED.avg_usage,
+            deviation = EXCLUDED.deviation,
+            usage_z = EXCLUDED.usage_z
+    """)
+
+
+def refresh_peer_risk(cur):
+    claims_z = capped_z_sql(
+        "t.total_claims",
+        "m.sum_claims / m.n_providers",
+        std_sql("m.n_providers", "m.sum_claims", "m.sumsq_claims"),
+        "m.n_providers",
+    )
+    cur.execute(f"""
+        INSERT INTO provider_peer_risk_mat (
+            provider_id, specialty, total_claims, claims_peer_z
+        )
+        SELECT
+            t.provider_id,
+            t.specialty,
+            t.total_claims,
+            {claims_z}
+        FROM provider_claim_totals t
+        JOIN specialty_claims_moments m ON m.specialty = t.specialty
+        WHERE t.specialty IN (SELECT DISTINCT specialty FROM touched_groups)
+          AND m.n_providers > 0
+        ON CONFLICT (provider_id) DO UPDATE
+        SET specialty = EXCLUDED.specialty,
+            total_claims = EXCLUDED.total_claims,
+            claims_peer_z = EXCLUDED.claims_peer_z
+    """)
+
+
+def refresh_fraud_score(cur):
+    # Only providers with a row in a touched group can have a new score
+    cur.execute("""
+        CREATE TEMP TABLE touched_providers ON COMMIT DROP AS
+        SELECT DISTINCT u.provider_id
+        FROM provider_cpt_usage_mat u
+        JOIN touched_groups t
+          ON t.specialty = u.specialty AND t.cpt_code = u.cpt_code
+    """)
+    cur.execute("ALTER TABLE touched_providers ADD PRIMARY KEY (provider_id)")
+    cur.execute("""
+        DELETE FROM provider_fraud_score_mat s
+        USING touched_providers t
+        WHERE s.provider_id = t.provider_id
+    """)
+    cur.execute("""
+        INSERT INTO provider_fraud_score_mat (provider_id, fraud_risk_score)
+        SELECT
+            d.provider_id,
+            SUM(d.deviation * c.complexity_score)
+        FROM provider_deviation_mat d
+        JOIN touched_providers t ON t.provider_id = d.provider_id
+        JOIN cpt_complexity_mat c ON d.cpt_code = c.cpt_code
+        GROUP BY d.provider_id
+        HAVING SUM(d.deviation * c.complexity_score) IS NOT NULL
+    """)
+
+
+def refresh_explanation(cur):
+    cur.execute("""
+        DELETE FROM provider_fraud_explanation_mat e
+        USING touched_groups t
+        WHERE e.specialty = t.specialty AND e.cpt_code = t.cpt_code
+    """)
+    cur.execute("""
+        INSERT INTO provider_fraud_explanation_mat (
+            provider_id, specialty, cpt_code, usage_count, avg_usage,
+            deviation, complexity_score, risk_level, risk_contribution
+        )
+        SELECT
+            d.provider_id,
+            d.specialty,
+            d.cpt_code,
+            d.usage_count,
+            d.avg_usage,
+            d.deviation,
+            c.complexity_score,
+            c.risk_level,
+            (d.deviation * c.complexity_score)
+        FROM provider_deviation_mat d
+        JOIN touched_groups t
+          ON t.specialty = d.specialty AND t.cpt_code = d.cpt_code
+        JOIN cpt_complexity_mat c
+          ON d.cpt_code = c.cpt_code
+        WHERE d.deviation > 0
+          AND c.complexity_score IS NOT NULL
+    """)
+
+
+def refresh_explanation_topk(cur):
+    # Uses touched_providers from refresh_fraud_score: only providers with a
+    # row in a touched group can have different explanations
+    cur.execute("""
+        DELETE FROM provider_explanation_topk k
+        USING touched_providers t
+        WHERE k.provider_id = t.provider_id
+    """)
+    cur.execute(
+        """
+        INSERT INTO provider_explanation_topk (
+            provider_id, rank, cpt_code, usage_count, avg_usage, deviation,
+            complexity_score, risk_level, risk_contribution
+        )
+        SELECT
+            t.provider_id,
+            e.rank,
+            e.cpt_code,
+            e.usage_count,
+            e.avg_usage,
+            e.deviation,
+            e.complexity_score,
+            e.risk_level,
+            e.risk_contribution
+        FROM touched_providers t
+        CROSS JOIN LATERAL (
+            SELECT
+                x.*,
+                ROW_NUMBER() OVER (ORDER BY x.risk_contribution DESC, x.cpt_code) AS rank
+            FROM provider_fraud_explanation_mat x
+            WHERE x.provider_id = t.provider_id
+            ORDER BY x.risk_contribution DESC, x.cpt_code
+            LIMIT %(top_k)s
+        ) e
+        ORDER BY t.provider_id, e.rank
+        """,
+        {"top_k": EXPLANATION_TOP_K},
+    )
+
+
+# Scoring views and the tables that materialize them
+VIEW_MATS = {
+    "provider_cpt_usage": "provider_cpt_usage_mat",
+    "specialty_cpt_baseline": "specialty_cpt_baseline_mat",
+    "provider_deviation": "provider_deviation_mat",
+    "cpt_complexity_view": "cpt_complexity_mat",
+    "provider_fraud_score": "provider_fraud_score_mat",
+    "provider_fraud_explanation": "provider_fraud_explanation_mat",
+}
+
+
+def live_view_sql(cur, view):
+    """
+    The database's own definition of `view` (pg_get_viewdef), reading the
+    *_mat tables in place of the views they materialize, so the *_mat
+    copy cannot drift from the view it replaces. Raises if the view reads
+    claims or a view with no *_mat table, either of which would mean
+    rescanning claims on every run.
+    """
+    cur.execute(
+        """
+        SELECT DISTINCT c.relname, c.relkind
+        FROM pg_rewrite r
+        JOIN pg_depend d ON d.classid = 'pg_rewrite'::regclass AND d.objid = r.oid
+        JOIN pg_class c ON c.oid = d.refobjid
+        WHERE r.ev_class = %s::regclass
+          AND c.oid <> r.ev_class
+          AND c.relkind IN ('r', 'p', 'v', 'm')
+        """,
+        (view,),
+    )
+    unsupported = sorted(
+        name for name, kind in cur.fetchall()
+        if name == "claims" or (kind in ("v", "m") and name not in VIEW_MATS)
+    )
+    if unsupported:
+        raise RuntimeError(f"{view} reads {', '.join(unsupported)}, which have no *_mat table")
+
+    cur.execute("SELECT pg_get_viewdef(%s::regclass)", (view,))
+    definition = cur.fetchone()[0].strip().rstrip(";")
+    pattern = r"\b(" + "|".join(VIEW_MATS) + r")\b"
+    definition = re.sub(pattern, lambda m: VIEW_MATS[m.group(1)], definition)
+    # Runs through psycopg2 parameter formatting
+    return definition.replace("%", "%%")
+
+
+def refresh_risk_summary(cur):
+    # Uses touched_providers from refresh_fraud_score. The provider ids are
+    # passed as a constant array so the filter is pushed down into the
+    # view's GROUP BY provider_id instead of aggregating every provider.
+    cur.execute("""
+        DELETE FROM provider_risk_summary_mat s
+        USING touched_providers t
+        WHERE s.provider_id = t.provider_id
+    """)
+    cur.execute("SELECT provider_id FROM touched_providers")
+    providers = [r[0] for r in cur.fetchall()]
+    cur.execute(
+        f"""
+        INSERT INTO provider_risk_summary_mat (
+            provider_id, specialty, avg_deviation, total_claims
+        )
+        SELECT v.provider_id, v.specialty, v.avg_deviation, v.total_claims
+        FROM ({live_view_sql(cur, "provider_risk_summary")}) v
+        WHERE v.provider_id = ANY(%(providers)s)
+        """,
+        {"providers": providers},
+    )
+
+
+def refresh_peer_comparison(cur):
+    # Ranks are within (specialty, cpt_code), so touched groups are re-ranked
+    # whole and everything else is left alone. The constant-array filters
+    # are on the window's partition columns, so they are pushed below the
+    # window functions; the join then keeps exactly the touched pairs.
+    cur.execute("""
+        DELETE FROM provider_peer_comparison_mat p
+        USING touched_groups t
+        WHERE p.specialty = t.specialty AND p.cpt_code = t.cpt_code
+    """)
+    cur.execute("SELECT array_agg(DISTINCT specialty), array_agg(DISTINCT cpt_code) FROM touched_groups")
+    specialties, cpt_codes = cur.fetchone()
+    cur.execute(
+        f"""
+        INSERT INTO provider_peer_comparison_mat (
+            provider_id, specialty, cpt_code, usage_count, risk_contribution,
+            peer_rank, peer_percentile, peer_group_size
+        )
+        SELECT
+            v.provider_id,
+            v.specialty,
+            v.cpt_code,
+            v.usage_count,
+            v.risk_contribution,
+            v.peer_rank,
+            v.peer_percentile,
+            v.peer_group_size
+        FROM ({live_view_sql(cur, "provider_peer_comparison_strict")}) v
+        JOIN touched_groups t
+          ON t.specialty = v.specialty AND t.cpt_code = v.cpt_code
+        WHERE v.specialty = ANY(%(specialties)s)
+          AND v.cpt_code = ANY(%(cpt_codes)s)
+        """,
+        {"specialties": specialties or [], "cpt_codes": cpt_codes or []},
+    )
+
+
+# ---- SPIKE RISK (O(queued months)) ----
+def refresh_spike_risk(cur, full):
+    """
+    Recount claims per provider for each queued service month, then rescore
+    the providers active in those months.
+
+    Every recount filters on a literal [month, next month) service_date
+    range, so on the partitioned claims table the planner prunes it to that
+    month's partition. A full run first finds the months with a DISTINCT
+    scan over claims and then recounts each one, i.e. one extra scan of
+    every partition.
+    """
+    if full:
+        cur.execute("""
+            SELECT DISTINCT date_trunc('month', service_date)::date
+            FROM claims
+            WHERE service_date IS NOT NULL
+        """)
+    else:
+        cur.execute("DELETE FROM scoring_pending_months RETURNING month")
+    months = sorted(r[0] for r in cur.fetchall())
+
+    cur.execute("CREATE TEMP TABLE spike_providers (provider_id BIGINT PRIMARY KEY) ON COMMIT DROP")
+    for month in months:
+        cur.execute("DELETE FROM provider_monthly_claims WHERE month = %s", (month,))
+        cur.execute(
+            """
+            INSERT INTO provider_monthly_claims (provider_id, month, claims)
+            SELECT provider_id, %(month)s, COUNT(*)
+            FROM claims
+            WHERE service_date >= %(month)s
+              AND service_date < %(month)s + INTERVAL '1 month'
+              AND provider_id IS NOT NULL
+            GROUP BY provider_id
+            """,
+            {"month": month},
+        )
+        cur.execute(
+            """
+            INSERT INTO spike_providers
+            SELECT provider_id FROM provider_monthly_claims WHERE month = %s
+            ON CONFLICT DO NOTHING
+            """,
+            (month,),
+        )
+
+    # Each active month is z-scored against the provider's own active months
+    spike_z = capped_z_sql("m.claims", "s.avg_claims", "s.std_claims", "s.active_months")
+    cur.execute(f"""
+        INSERT INTO provider_spike_risk_mat (
+            provider_id, max_spike_risk, spike_month, active_months
+        )
+        SELECT DISTINCT ON (m.provider_id)
+            m.provider_id,
+            {spike_z},
+            m.month,
+            s.active_months
+        FROM provider_monthly_claims m
+        JOIN (
+            SELECT
+                h.provider_id,
+                COUNT(*) AS active_months,
+                AVG(h.claims) AS avg_claims,
+                STDDEV(h.claims) AS std_claims
+            FROM provider_monthly_claims h
+            JOIN spike_providers p ON p.provider_id = h.provider_id
+            GROUP BY h.provider_id
+        ) s ON s.provider_id = m.provider_id
+        ORDER BY m.provider_id, m.claims DESC, m.month DESC
+        ON CONFLICT (provider_id) DO UPDATE
+        SET max_spike_risk = EXCLUDED.max_spike_risk,
+            spike_month = EXCLUDED.spike_month,
+            active_months = EXCLUDED.active_months
+    """)
+    return len(months)
+
+
+# ---- PROVIDER PROFILE (O(touched specialties + spike providers)) ----
+# Leading provider_explanation_topk rows copied into each profile
+PROFILE_TOP_EXPLANATIONS = 5
+
+
+def refresh_profile(cur):
+    """
+    Rebuild provider_profile rows whose inputs changed in this run.
+
+    Peer z is relative to the whole specialty, so every provider in a touched
+    specialty is rebuilt; spike risk changes for the providers active in the
+    recounted months (spike_providers from refresh_spike_risk). Everything
+    else a profile holds only moves with those two sets.
+    """
+    cur.execute("""
+        CREATE TEMP TABLE profile_providers ON COMMIT DROP AS
+        SELECT provider_id
+        FROM provider_peer_risk_mat
+        WHERE specialty IN (SELECT DISTINCT specialty FROM touched_groups)
+        UNION
+        SELECT provider_id FROM spike_providers
+    """)
+    cur.execute("ALTER TABLE profile_providers ADD PRIMARY KEY (provider_id)")
+    cur.execute("""
+        DELETE FROM provider_profile f
+        USING profile_providers p
+        WHERE f.provider_id = p.provider_id
+    """)
+    cur.execute(
+        f"""
+        INSERT INTO provider_profile (
+            provider_id, specialty, total_claims, avg_claim_amount,
+            claims_peer_z, risk_tier, max_spike_risk, spike_month,
+            fraud_risk_score, top_explanations
+        )
+        SELECT
+            pr.provider_id,
+            pr.specialty,
+            pr.total_claims,
+            t.amount_total / NULLIF(t.amount_claims, 0),
+            pr.claims_peer_z,
+            {risk_tier_sql("pr.claims_peer_z")},
+            sr.max_spike_risk,
+            sr.spike_month,
+            fs.fraud_risk_score,
+            COALESCE(x.top_explanations, '[]')
+        FROM profile_providers p
+        JOIN provider_peer_risk_mat pr ON pr.provider_id = p.provider_id
+        LEFT JOIN provider_claim_totals t ON t.provider_id = p.provider_id
+        LEFT JOIN provider_spike_risk_mat sr ON sr.provider_id = p.provider_id
+        LEFT JOIN provider_fraud_score_mat fs ON fs.provider_id = p.provider_id
+        LEFT JOIN LATERAL (
+            SELECT jsonb_agg(
+                jsonb_build_object(
+                    'rank', k.rank,
+                    'cpt_code', k.cpt_code,
+                    'usage_count', k.usage_count,
+                    'avg_usage', k.avg_usage,
+                    'deviation', k.deviation,
+                    'complexity_score', k.complexity_score,
+                    'risk_level', k.risk_level,
+                    'risk_contribution', k.risk_contribution
+                )
+                ORDER BY k.rank
+            ) AS top_explanations
+            FROM provider_explanation_topk k
+            WHERE k.provider_id = p.provider_id
+              AND k.rank <= %(top_k)s
+        ) x ON true
+        """,
+        {"top_k": PROFILE_TOP_EXPLANATIONS},
+    )
+    cur.execute("SELECT COUNT(*) FROM profile_providers")
+    return cur.fetchone()[0]
+
+
+STAGES = [
+    ("provider_cpt_usage / peer_cpt_moments", apply_usage_deltas),
+    ("provider_claim_totals / specialty_claims_moments", apply_provider_totals),
+    ("cpt_complexity", apply_cpt_deltas),
+    ("specialty_cpt_baseline", refresh_baseline),
+    ("provider_deviation", refresh_deviation),
+    ("provider_peer_risk", refresh_peer_risk),
+    ("provider_fraud_score", refresh_fraud_score),
+    ("provider_fraud_explanation", refresh_explanation),
+    ("provider_explanation_topk", refresh_explanation_topk),
+    ("provider_risk_summary", refresh_risk_summary),
+    ("provider_peer_comparison", refresh_peer_comparison),
+]
+
+
+# ---- RUN ----
+def run_scoring(full=False):
+    """
+    Refresh the *_mat scoring tables and record a scoring run.
+
+    Incremental runs apply only the claim deltas queued since the last run;
+    full runs (the first run on a database, or the first after claims were
+    updated or deleted) rebuild from claims. All stages commit together, so
+    readers never see a half-refreshed pipeline.
+    Returns the new run_id, or None if nothing was queued.
+    """
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            if schema_version(cur) != SCHEMA_VERSION:
+                raise RuntimeError(
+                    "Scoring schema is missing or out of date - "
+                    "run `scoring_pipeline.py --init` first"
+                )
+
+            cur.execute("SELECT 1 FROM scoring_runs WHERE status = 'complete' LIMIT 1")
+            full = full or cur.fetchone() is None
+            cur.execute("SELECT 1 FROM scoring_pending_full LIMIT 1")
+            full = full or cur.fetchone() is not None
+            mode = "full" if full else "incremental"
+
+            start = time.perf_counter()
+            groups = collect_batch(cur, full)
+            if groups == 0:
+                conn.rollback()
+                print("No new claims since the last scoring run - nothing to refresh")
+                return None
+
+            print(f"Scoring run ({mode}): {groups} peer groups to refresh")
+            for name, stage in STAGES:
+                t0 = time.perf_counter()
+                stage(cur)
+                print(f"  {name}: {time.perf_counter() - t0:.2f}s")
+
+            t0 = time.perf_counter()
+            months = refresh_spike_risk(cur, full)
+            print(f"  provider_spike_risk ({months} months): {time.perf_counter() - t0:.2f}s")
+
+            t0 = time.perf_counter()
+            profiles = refresh_profile(cur)
+            print(f"  provider_profile ({profiles} providers): {time.perf_counter() - t0:.2f}s")
+
+            if full:
+                # Incremental runs rewrite only touched providers' rows,
+                # so the physical order is restored on full runs
+                cur.execute(
+                    "CLUSTER provider_explanation_topk USING provider_explanation_topk_pkey"
+                )
+
+            for table in API_LIST_TABLES:
+                cur.execute(f"ANALYZE {table}")
+
+            cur.execute(
+                """
+                INSERT INTO scoring_runs (mode, status, peer_groups_refreshed, finished_at)
+                VALUES (%s, 'complete', %s, now())
+                RETURNING run_id
+                """,
+                (mode, groups),
+            )
+            run_id = cur.fetchone()[0]
+
+        conn.commit()
+        print(f"Scoring run {run_id} complete in {time.perf_counter() - start:.2f}s")
+        return run_id
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh materialized scoring tables")
+    parser.add_argument("--full", action="store_true", help="rebuild from the claims table")
+    parser.add_argument("--init", action="store_true", help="create or upgrade the scoring schema and exit")
+    args = parser.parse_args()
+
+    if args.init:
+        conn = get_connection()
+        try:
+            ensure_schema(conn)
+        finally:
+            conn.close()
+        print(f"Scoring schema {SCHEMA_VERSION} is in place")
+    else:
+        run_scoring(full=args.full)
@@ -0,0 +1,21 @@
+import os
+import sys
+import types
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# backend/app.py (the Streamlit dashboard) shadows the API's app/ package
+# when backend/ is on sys.path, so register the package explicitly
+if "app" not in sys.modules:
+    package = types.ModuleType("app")
+    package.__path__ = [os.path.join(BACKEND, "app")]
+    sys.modules["app"] = package
+
+# Shared top-level modules the API imports (peer_moments, provider_search)
+if BACKEND not in sys.path:
+    sys.path.append(BACKEND)
+
+# app.core.config requires these; the tests never connect
+os.environ.setdefault("DB_NAME", "test")
+os.environ.setdefault("DB_USER", "test")
+os.environ.setdefault("DB_PASSWORD", "test")
@@ -0,0 +1,157 @@
+import math
+
+import numpy as np
+import pytest
+
+from app.core.baselines import (
+    ARRAY_FIELDS,
+    CODE_FIELDS,
+    build_snapshot,
+    open_snapshot,
+    save_snapshot,
+    score_claims,
+)
+from peer_moments import Z_CAP
+
+# (specialty, cpt_code, n_providers, avg_usage, std_usage)
+BASELINES = [
+    ("Cardiology", "93000", 10, 4.0, 2.0),
+    ("Cardiology", "99213", 3, 4.0, 2.0),      # n < 5
+    ("Cardiology", "99214", 8, 6.0, 0.0),      # std = 0
+    ("Cardiology", "20610", 6, 5.0, None),     # std NULL
+    ("Dermatology", "93000", 12, 1.0, 0.5),
+]
+# (cpt_code, rbcs_id, complexity_score, risk_level)
+COMPLEXITY = [
+    ("93000", "T1", 3, "High"),
+    ("99213", "E1", 1, "Low"),
+    ("99214", "E1", 2, "Medium"),
+    ("20610", "P1", None, None),
+]
+# (provider_id, specialty)
+PROVIDERS = [
+    (1002, "Dermatology"),
+    (1001, "Cardiology"),
+]
+# (provider_id, cpt_code, usage_count)
+USAGE = [
+    (1001, "93000", 7),
+    (1001, "99214", 6),
+    (1002, "93000", 30),
+]
+
+
+@pytest.fixture
+def snapshot():
+    return build_snapshot(42, BASELINES, COMPLEXITY, PROVIDERS, USAGE)
+
+
+def score_one(snapshot, provider_id, cpt_code):
+    result = score_claims(snapshot, [provider_id], [cpt_code])
+    return {name: values[0] for name, values in result.items()}
+
+
+def test_known_provider_is_scored_as_one_more_claim(snapshot):
+    r = score_one(snapshot, 1001, "93000")
+    assert r["known_provider"]
+    assert snapshot.specialties[r["specialty_idx"]] == "Cardiology"
+    assert r["usage_count"] == 8
+    assert r["peer_group_size"] == 10
+    assert r["deviation"] == pytest.approx(4.0)
+    assert r["usage_z"] == pytest.approx(2.0)
+    assert r["complexity_score"] == 3
+    assert snapshot.risk_levels[r["risk_level_idx"]] == "High"
+    assert r["risk_contribution"] == pytest.approx(12.0)
+
+
+def test_z_is_capped(snapshot):
+    r = score_one(snapshot, 1002, "93000")
+    assert r["usage_count"] == 31
+    assert r["usage_z"] == Z_CAP
+
+
+def test_first_claim_for_a_cpt_starts_from_zero_usage(snapshot):
+    r = score_one(snapshot, 1002, "99214")
+    assert r["known_provider"]
+    assert r["usage_count"] == 1
+    # Dermatology has no 99214 baseline
+    assert r["peer_group_size"] == 0
+    assert math.isnan(r["usage_z"])
+
+
+def test_unknown_provider(snapshot):
+    r = score_one(snapshot, 9999, "93000")
+    assert not r["known_provider"]
+    assert r["specialty_idx"] == -1
+    assert r["usage_count"] == 1
+    assert r["peer_group_size"] == 0
+    assert math.isnan(r["peer_avg_usage"])
+    assert math.isnan(r["usage_z"])
+    # The CPT is still known
+    assert r["complexity_score"] == 3
+
+
+def test_unknown_cpt(snapshot):
+    r = score_one(snapshot, 1001, "00000")
+    assert r["known_provider"]
+    assert r["usage_count"] == 1
+    assert r["peer_group_size"] == 0
+    assert math.isnan(r["usage_z"])
+    assert r["complexity_score"] == -1
+    assert r["risk_level_idx"] == -1
+    assert math.isnan(r["risk_contribution"])
+
+
+def test_small_peer_group_has_no_z(snapshot):
+    r = score_one(snapshot, 1001, "99213")
+    assert r["peer_group_size"] == 3
+    assert not math.isnan(r["deviation"])
+    assert math.isnan(r["usage_z"])
+
+
+def test_zero_std_gives_zero_z(snapshot):
+    r = score_one(snapshot, 1001, "99214")
+    assert r["usage_count"] == 7
+    assert r["usage_z"] == 0.0
+
+
+def test_null_std_gives_zero_z(snapshot):
+    r = score_one(snapshot, 1001, "20610")
+    assert math.isnan(r["peer_std_usage"])
+    assert r["usage_z"] == 0.0
+    # No complexity score for the CPT
+    assert math.isnan(r["risk_contribution"])
+
+
+def test_batch_matches_single_claims(snapshot):
+    claims = [(1001, "93000"), (9999, "93000"), (1001, "00000"), (1002, "93000")]
+    batch = score_claims(snapshot, [p for p, _ in claims], [c for _, c in claims])
+    for i, (provider_id, cpt_code) in enumerate(claims):
+        single = score_one(snapshot, provider_id, cpt_code)
+        for name, values in batch.items():
+            np.testing.assert_array_equal(values[i], single[name])
+
+
+def test_saved_snapshot_opens_identically(snapshot, tmp_path):
+    path = save_snapshot(snapshot, str(tmp_path))
+    assert path == str(tmp_path / "run_42")
+    # A second save of the same run is a no-op
+    assert save_snapshot(snapshot, str(tmp_path)) == path
+
+    opened = open_snapshot(path)
+    assert opened.run_id == snapshot.run_id
+    for name in CODE_FIELDS:
+        assert getattr(opened, name) == getattr(snapshot, name)
+    for name in ARRAY_FIELDS:
+        expected = getattr(snapshot, name)
+        actual = getattr(opened, name)
+        assert isinstance(actual, np.memmap)
+        assert actual.dtype == expected.dtype
+        np.testing.assert_array_equal(actual, expected)
+
+    providers = [1001, 1001, 1002, 9999, 1001]
+    cpts = ["93000", "99213", "93000", "93000", "00000"]
+    expected = score_claims(snapshot, providers, cpts)
+    actual = score_claims(opened, providers, cpts)
+    for name in expected:
+        np.testing.assert_array_equal(actual[name], expected[name])